@@ -0,0 +1,159 @@
+"""partition payments by month
+
+Revision ID: 0b8e4c0e9400
+Revises: 2b6f38defcfc
+Create Date: 2026-10-17 22:04:12.318402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Creates the partition of the month containing the given date. Rows of
+# that month that already landed in payments_default are moved into the
+# new partition first, otherwise attaching it would fail. Statement-level
+# triggers live on the parent table only, so the move does not touch the
+# rollups or credit totals.
+PARTITION_FUNCTION = """
+CREATE FUNCTION create_payments_partition(month date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    start timestamp := date_trunc('month', month);
+    stop timestamp := start + interval '1 month';
+    partition text := 'payments_' || to_char(start, 'YYYY_MM');
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext(partition));
+    IF to_regclass(partition) IS NOT NULL THEN
+        RETURN partition;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE payments INCLUDING DEFAULTS)', partition
+    );
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM payments_default '
+        'WHERE payment_date >= %L AND payment_date < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        start, stop, partition
+    );
+    EXECUTE format(
+        'ALTER TABLE payments ATTACH PARTITION %I '
+        'FOR VALUES FROM (%L) TO (%L)',
+        partition, start, stop
+    );
+    RETURN partition;
+END
+$$;
+"""
+
+# Statement-level triggers of the "monthly rollups" and "credit payment
+# totals" migrations, recreated on the new table.
+PAYMENT_TRIGGERS = {
+    "rollup": "monthly_collections_rollup",
+    "totals": "credit_payment_totals",
+}
+
+COLUMNS = "id, sum, payment_date, credit_id, type_id"
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b8e4c0e9400'
+down_revision: Union[str, None] = '2b6f38defcfc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_triggers() -> None:
+    for name, function in PAYMENT_TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER payments_{name}_insert AFTER INSERT ON payments "
+            "REFERENCING NEW TABLE AS new_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+        op.execute(
+            f"CREATE TRIGGER payments_{name}_update AFTER UPDATE ON payments "
+            "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+        op.execute(
+            f"CREATE TRIGGER payments_{name}_delete AFTER DELETE ON payments "
+            "REFERENCING OLD TABLE AS old_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+
+
+def set_aside(table: str) -> None:
+    """Rename payments out of the way, freeing its index names."""
+    for name in PAYMENT_TRIGGERS:
+        for operation in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER payments_{name}_{operation} ON payments")
+    for column in ("credit_id", "id", "payment_date", "type_id"):
+        op.drop_index(op.f(f'ix_payments_{column}'), table_name='payments')
+    op.execute(f"ALTER TABLE payments RENAME CONSTRAINT payments_pkey TO {table}_pkey")
+    op.execute(f"ALTER TABLE payments RENAME TO {table}")
+
+
+def create_indexes() -> None:
+    op.create_index(op.f('ix_payments_credit_id'), 'payments', ['credit_id'], unique=False)
+    op.create_index(op.f('ix_payments_id'), 'payments', ['id'], unique=False)
+    op.create_index(op.f('ix_payments_payment_date'), 'payments', ['payment_date'], unique=False)
+    op.create_index(op.f('ix_payments_type_id'), 'payments', ['type_id'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    set_aside('payments_unpartitioned')
+    op.create_table('payments',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('payments_id_seq'::regclass)"), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=False),
+    sa.Column('payment_date', sa.DateTime(), nullable=False),
+    sa.Column('credit_id', sa.Integer(), nullable=False),
+    sa.Column('type_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['credit_id'], ['credits.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['type_id'], ['dictionaries.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'payment_date'),
+    postgresql_partition_by='RANGE (payment_date)'
+    )
+    op.execute("ALTER SEQUENCE payments_id_seq OWNED BY payments.id")
+    create_indexes()
+
+    op.execute(PARTITION_FUNCTION)
+    op.execute("CREATE TABLE payments_default PARTITION OF payments DEFAULT")
+    op.execute(
+        "SELECT create_payments_partition(month) FROM ("
+        "SELECT DISTINCT date_trunc('month', payment_date)::date AS month "
+        "FROM payments_unpartitioned UNION SELECT current_date"
+        ") AS months ORDER BY month"
+    )
+    op.execute(
+        f"INSERT INTO payments ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM payments_unpartitioned"
+    )
+    op.drop_table('payments_unpartitioned')
+    create_triggers()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    set_aside('payments_partitioned')
+    op.create_table('payments',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('payments_id_seq'::regclass)"), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=False),
+    sa.Column('payment_date', sa.DateTime(), nullable=False),
+    sa.Column('credit_id', sa.Integer(), nullable=False),
+    sa.Column('type_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['credit_id'], ['credits.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['type_id'], ['dictionaries.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("ALTER SEQUENCE payments_id_seq OWNED BY payments.id")
+    create_indexes()
+
+    op.execute(
+        f"INSERT INTO payments ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM payments_partitioned"
+    )
+    op.drop_table('payments_partitioned')
+    op.execute("DROP FUNCTION create_payments_partition(date)")
+    create_triggers()
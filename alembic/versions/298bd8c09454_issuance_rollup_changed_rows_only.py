@@ -0,0 +1,113 @@
+"""issuance rollup changed rows only
+
+Revision ID: 298bd8c09454
+Revises: 9fdfd59503a9
+Create Date: 2026-10-17 22:08:52.441662
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# Every payment statement updates the paid_* totals of its credits, which
+# fires credits_rollup_update. Only rows whose issuance_date or body
+# changed (or whose id did) move issuance between months, so the UPDATE
+# branch leaves monthly_issuance alone, unlocked, for all other rows.
+ISSUANCE_FUNCTION = """
+CREATE OR REPLACE FUNCTION monthly_issuance_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        WITH changed AS (
+            SELECT o.issuance_date AS old_date, o.body AS old_body,
+                   n.issuance_date AS new_date, n.body AS new_body
+            FROM old_rows AS o
+            FULL JOIN new_rows AS n ON n.id = o.id
+            WHERE (o.issuance_date, o.body)
+                IS DISTINCT FROM (n.issuance_date, n.body)
+        )
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT month, sum(credits_count), sum(body_sum)
+        FROM (
+            SELECT date_trunc('month', old_date) AS month,
+                   -1 AS credits_count, -old_body AS body_sum
+            FROM changed
+            WHERE old_date IS NOT NULL
+            UNION ALL
+            SELECT date_trunc('month', new_date), 1, new_body
+            FROM changed
+            WHERE new_date IS NOT NULL
+        ) AS deltas
+        GROUP BY month
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT date_trunc('month', issuance_date), -count(*), -sum(body)
+        FROM old_rows
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+    ELSE
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT date_trunc('month', issuance_date), count(*), sum(body)
+        FROM new_rows
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+# monthly_issuance_rollup() as created by 6f5462d1d56b
+PREVIOUS_ISSUANCE_FUNCTION = """
+CREATE OR REPLACE FUNCTION monthly_issuance_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT date_trunc('month', issuance_date), -count(*), -sum(body)
+        FROM old_rows
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT date_trunc('month', issuance_date), count(*), sum(body)
+        FROM new_rows
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+
+# revision identifiers, used by Alembic.
+revision: str = '298bd8c09454'
+down_revision: Union[str, None] = '9fdfd59503a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(ISSUANCE_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(PREVIOUS_ISSUANCE_FUNCTION)
@@ -0,0 +1,143 @@
+"""credit payment totals
+
+Revision ID: 2b6f38defcfc
+Revises: 6f5462d1d56b
+Create Date: 2026-10-17 21:29:50.085288
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Payments are split into body and percent by the payment type's name,
+# matching BODY_PAYMENT_TYPE and PERCENT_PAYMENT_TYPE in backend.queries.
+PAYMENT_TOTALS = """
+    coalesce(sum(p.sum) FILTER (WHERE d.name = 'тіло'), 0) AS paid_body,
+    coalesce(sum(p.sum) FILTER (WHERE d.name = 'відсотки'), 0)
+        AS paid_percent,
+    coalesce(sum(p.sum), 0) AS total_paid,
+    count(p.id) AS payments_count,
+    max(p.payment_date) AS last_payment_date
+"""
+
+TOTALS_FUNCTION = f"""
+CREATE FUNCTION credit_payment_totals() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    touched integer[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        -- New payments only add to the totals
+        UPDATE credits AS c
+        SET paid_body = c.paid_body + t.paid_body,
+            paid_percent = c.paid_percent + t.paid_percent,
+            total_paid = c.total_paid + t.total_paid,
+            payments_count = c.payments_count + t.payments_count,
+            last_payment_date =
+                greatest(c.last_payment_date, t.last_payment_date)
+        FROM (
+            SELECT p.credit_id, {PAYMENT_TOTALS}
+            FROM new_rows AS p
+            LEFT JOIN dictionaries AS d ON d.id = p.type_id
+            GROUP BY p.credit_id
+        ) AS t
+        WHERE c.id = t.credit_id;
+        RETURN NULL;
+    END IF;
+
+    -- Updated or deleted payments may move the last payment date back,
+    -- so the totals of the touched credits are recomputed.
+    IF TG_OP = 'UPDATE' THEN
+        touched := ARRAY(
+            SELECT credit_id FROM old_rows
+            UNION
+            SELECT credit_id FROM new_rows
+        );
+    ELSE
+        touched := ARRAY(SELECT DISTINCT credit_id FROM old_rows);
+    END IF;
+    UPDATE credits AS c
+    SET paid_body = t.paid_body,
+        paid_percent = t.paid_percent,
+        total_paid = t.total_paid,
+        payments_count = t.payments_count,
+        last_payment_date = t.last_payment_date
+    FROM unnest(touched) AS u(credit_id)
+    CROSS JOIN LATERAL (
+        SELECT {PAYMENT_TOTALS}
+        FROM payments AS p
+        LEFT JOIN dictionaries AS d ON d.id = p.type_id
+        WHERE p.credit_id = u.credit_id
+    ) AS t
+    WHERE c.id = u.credit_id;
+    RETURN NULL;
+END
+$$;
+"""
+
+BACKFILL = f"""
+UPDATE credits AS c
+SET paid_body = t.paid_body,
+    paid_percent = t.paid_percent,
+    total_paid = t.total_paid,
+    payments_count = t.payments_count,
+    last_payment_date = t.last_payment_date
+FROM (
+    SELECT p.credit_id, {PAYMENT_TOTALS}
+    FROM payments AS p
+    LEFT JOIN dictionaries AS d ON d.id = p.type_id
+    GROUP BY p.credit_id
+) AS t
+WHERE c.id = t.credit_id;
+"""
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b6f38defcfc'
+down_revision: Union[str, None] = '6f5462d1d56b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('credits', sa.Column('paid_body', sa.Float(), server_default='0', nullable=False))
+    op.add_column('credits', sa.Column('paid_percent', sa.Float(), server_default='0', nullable=False))
+    op.add_column('credits', sa.Column('total_paid', sa.Float(), server_default='0', nullable=False))
+    op.add_column('credits', sa.Column('payments_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('credits', sa.Column('last_payment_date', sa.DateTime(), nullable=True))
+    # ### end Alembic commands ###
+    op.execute(TOTALS_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER payments_totals_insert AFTER INSERT ON payments "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION credit_payment_totals()"
+    )
+    op.execute(
+        "CREATE TRIGGER payments_totals_update AFTER UPDATE ON payments "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION credit_payment_totals()"
+    )
+    op.execute(
+        "CREATE TRIGGER payments_totals_delete AFTER DELETE ON payments "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION credit_payment_totals()"
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for operation in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER payments_totals_{operation} ON payments")
+    op.execute("DROP FUNCTION credit_payment_totals()")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_column('credits', 'last_payment_date')
+    op.drop_column('credits', 'payments_count')
+    op.drop_column('credits', 'total_paid')
+    op.drop_column('credits', 'paid_percent')
+    op.drop_column('credits', 'paid_body')
+    # ### end Alembic commands ###
@@ -0,0 +1,142 @@
+"""monthly rollups
+
+Revision ID: 6f5462d1d56b
+Revises: 97d54a1383e7
+Create Date: 2026-10-17 21:19:00.150762
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+ROLLUP_FUNCTIONS = """
+CREATE FUNCTION monthly_issuance_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT date_trunc('month', issuance_date), -count(*), -sum(body)
+        FROM old_rows
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_issuance AS r (month, credits_count, body_sum)
+        SELECT date_trunc('month', issuance_date), count(*), sum(body)
+        FROM new_rows
+        GROUP BY 1
+        ON CONFLICT (month) DO UPDATE
+        SET credits_count = r.credits_count + EXCLUDED.credits_count,
+            body_sum = r.body_sum + EXCLUDED.body_sum;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE FUNCTION monthly_collections_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO monthly_collections AS r
+            (month, type_id, payments_count, sum)
+        SELECT date_trunc('month', payment_date), type_id, -count(*), -sum(sum)
+        FROM old_rows
+        GROUP BY 1, 2
+        ON CONFLICT (month, type_id) DO UPDATE
+        SET payments_count = r.payments_count + EXCLUDED.payments_count,
+            sum = r.sum + EXCLUDED.sum;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_collections AS r
+            (month, type_id, payments_count, sum)
+        SELECT date_trunc('month', payment_date), type_id, count(*), sum(sum)
+        FROM new_rows
+        GROUP BY 1, 2
+        ON CONFLICT (month, type_id) DO UPDATE
+        SET payments_count = r.payments_count + EXCLUDED.payments_count,
+            sum = r.sum + EXCLUDED.sum;
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+# Statement-level triggers with transition tables: a multi-row INSERT or
+# COPY updates each touched rollup row once instead of once per row.
+ROLLUP_TRIGGERS = {
+    "credits": "monthly_issuance_rollup",
+    "payments": "monthly_collections_rollup",
+}
+
+BACKFILL = """
+INSERT INTO monthly_issuance (month, credits_count, body_sum)
+SELECT date_trunc('month', issuance_date), count(*), sum(body)
+FROM credits
+GROUP BY 1;
+
+INSERT INTO monthly_collections (month, type_id, payments_count, sum)
+SELECT date_trunc('month', payment_date), type_id, count(*), sum(sum)
+FROM payments
+GROUP BY 1, 2;
+"""
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f5462d1d56b'
+down_revision: Union[str, None] = '97d54a1383e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('monthly_issuance',
+    sa.Column('month', sa.DateTime(), nullable=False),
+    sa.Column('credits_count', sa.Integer(), nullable=False),
+    sa.Column('body_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('month')
+    )
+    op.create_table('monthly_collections',
+    sa.Column('month', sa.DateTime(), nullable=False),
+    sa.Column('type_id', sa.Integer(), nullable=False),
+    sa.Column('payments_count', sa.Integer(), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['type_id'], ['dictionaries.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('month', 'type_id')
+    )
+    # ### end Alembic commands ###
+    op.execute(ROLLUP_FUNCTIONS)
+    for table, function in ROLLUP_TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER {table}_rollup_insert AFTER INSERT ON {table} "
+            "REFERENCING NEW TABLE AS new_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_rollup_update AFTER UPDATE ON {table} "
+            "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_rollup_delete AFTER DELETE ON {table} "
+            "REFERENCING OLD TABLE AS old_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()"
+        )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, function in ROLLUP_TRIGGERS.items():
+        for operation in ("insert", "update", "delete"):
+            op.execute(f"DROP TRIGGER {table}_rollup_{operation} ON {table}")
+        op.execute(f"DROP FUNCTION {function}()")
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('monthly_collections')
+    op.drop_table('monthly_issuance')
+    # ### end Alembic commands ###
@@ -1,31 +1,108 @@
+"""Bring the database schema to the latest alembic revision.
+
+Runs alembic in-process on one connection. The current revision is
+compared with the head of alembic/versions first, so a start against an
+up-to-date database costs a single query. Concurrent starts serialize on
+an advisory lock and re-check the revision once they hold it, so only
+one of them upgrades.
+
+Deployments from before the migrations were committed generated their
+own revisions at start-up, so their alembic_version names a revision
+that is not in alembic/versions (or is missing altogether). When the
+tables of the initial schema exist under such a revision, the database
+is stamped with INITIAL_REVISION and upgraded from there. The indexes
+INITIAL_REVISION has but those databases may lack are created first.
+"""
+
 import logging
-import subprocess
-import sys
+import time
+
+from sqlalchemy import func, inspect, select, text
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from backend.database import engine
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
 logger = logging.getLogger()
 
+MIGRATION_LOCK = 7204513001
+
+# Revision creating the schema the start-up autogeneration used to build
+INITIAL_REVISION = "97d54a1383e7"
+
+# Indexes of INITIAL_REVISION that databases created from older models do
+# not have; later revisions drop or rely on them
+INITIAL_INDEXES = {
+    "ix_credits_issuance_date": "credits (issuance_date)",
+    "ix_plans_period": "plans (period)",
+    "ix_payments_payment_date": "payments (payment_date)",
+}
 
-def run_command(command):
-    result = subprocess.run(
-        command, shell=True, capture_output=True, text=True
+
+def current_heads(connection) -> set[str]:
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def adopt_database(connection, config, script, current) -> bool:
+    """Stamp a database created by start-up autogeneration with the
+    initial revision. Return whether it was stamped."""
+    known = {revision.revision for revision in script.walk_revisions()}
+    if current and current <= known:
+        return False
+    if not inspect(connection).has_table("credits"):
+        return False
+    logger.warning(
+        "Database has the initial schema under "
+        f"{', '.join(sorted(current)) or 'no revision'}, which is not in "
+        f"alembic/versions; stamping it as {INITIAL_REVISION}"
     )
-    return result
+    for name, columns in INITIAL_INDEXES.items():
+        connection.execute(
+            text(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+        )
+    command.stamp(config, INITIAL_REVISION, purge=True)
+    return True
 
 
-def upgrade_database():
-    logger.info("Upgrading database...")
-    run_command("poetry run alembic upgrade head")
+def upgrade_database(config_file="alembic.ini"):
+    started = time.perf_counter()
+    config = Config(config_file)
+    config.attributes["configure_logger"] = False
+    script = ScriptDirectory.from_config(config)
+    heads = set(script.get_heads())
+
+    with engine.connect() as connection:
+        if current_heads(connection) == heads:
+            logger.info(
+                f"Database is up to date ({', '.join(sorted(heads))}), "
+                f"checked in {time.perf_counter() - started:.2f}s"
+            )
+            return
+        connection.rollback()
+
+        with connection.begin():
+            connection.execute(
+                select(func.pg_advisory_xact_lock(MIGRATION_LOCK))
+            )
+            current = current_heads(connection)
+            if current == heads:
+                logger.info("Database was upgraded by another process")
+                return
+            config.attributes["connection"] = connection
+            if adopt_database(connection, config, script, current):
+                current = {INITIAL_REVISION}
+            logger.info(
+                "Upgrading database from "
+                f"{', '.join(sorted(current)) or 'an empty schema'}..."
+            )
+            command.upgrade(config, "head")
+    logger.info(f"Database upgraded in {time.perf_counter() - started:.2f}s")
 
 
 def main():
-    result = run_command(
-        "poetry run alembic revision --autogenerate -m 'auto migration'"
-    )
-    if "No changes detected" in result.stdout:
-        logger.info("No database changes detected")
-    else:
-        logger.info("Database changes detected")
     upgrade_database()
 
 
@@ -0,0 +1,270 @@
+"""AsyncSession versions of the endpoints in backend.routers.
+
+Served instead of backend.routers when DB_ASYNC=true. Routes are copied
+from backend.routers so paths, schemas and OpenAPI docs stay identical;
+endpoints listed in ASYNC_ENDPOINTS are swapped for the implementations
+below, the rest keep their sync handlers. Uploads are parsed in the
+threadpool, so a large file does not block the event loop.
+"""
+
+import csv
+import datetime
+import io
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import queries, results, routers
+from backend.cache import plans_performance_cache
+from backend.config import PAYMENTS_INSERT_CHUNK_SIZE, USER_CREDIT_PAGE_LIMIT
+from backend.database import get_async_db, get_async_read_db
+from backend.dictionaries import dictionaries
+from backend.imports import PaymentImport, PlanImport
+from backend.partitions import payment_partitions
+from backend.schemas import PlanImportMode, UserIdsSchema
+
+
+async def get_user_credit(
+    response: Response,
+    user_id: int,
+    filters: queries.CreditFilters = Depends(routers.credit_filters),
+    limit: int | None = Query(
+        None, ge=1, le=USER_CREDIT_PAGE_LIMIT, description="Page size"
+    ),
+    cursor: str | None = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    after = results.decode_cursor(cursor) if cursor else None
+    rows = (
+        await db.execute(
+            queries.user_credits(
+                [user_id], filters, after, limit + 1 if limit else None
+            )
+        )
+    ).all()
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+
+    credits, next_cursor = results.user_credit_page(rows, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return credits
+
+
+async def get_user_credit_batch(
+    user_ids: UserIdsSchema, db: AsyncSession = Depends(get_async_read_db)
+):
+    return await _user_credits_batch(db, user_ids.user_ids)
+
+
+async def get_user_credit_batch_file(
+    file: UploadFile = File(...), db: AsyncSession = Depends(get_async_read_db)
+):
+    user_ids = await run_in_threadpool(list, results.read_user_ids(file))
+    return await _user_credits_batch(db, user_ids)
+
+
+async def _user_credits_batch(db, user_ids):
+    batch = results.UserCreditsBatch()
+    for chunk in batch.chunks(user_ids):
+        batch.add(await db.execute(queries.user_credits(chunk)))
+    return batch.results
+
+
+async def plans_insert(
+    file: UploadFile = File(...),
+    mode: PlanImportMode = Query(
+        "insert", description="insert, upsert or skip existing plans"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    reader = csv.reader(
+        io.TextIOWrapper(file.file, encoding="utf-8"), delimiter="\t"
+    )
+    plan_import = PlanImport((await dictionaries.aget(db)).ids)
+    await run_in_threadpool(plan_import.parse, reader)
+    if mode == "insert" and plan_import.plans:
+        plan_import.check_existing(
+            await db.execute(plan_import.existing_plans())
+        )
+    if plan_import.errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=plan_import.errors,
+        )
+
+    inserted = []
+    if plan_import.plans:
+        try:
+            inserted = (await db.scalars(plan_import.insert_plans(mode))).all()
+        except IntegrityError:
+            # Another upload stored some of the plans after the check
+            await db.rollback()
+            plan_import.check_existing(
+                await db.execute(plan_import.existing_plans())
+            )
+            if not plan_import.errors:
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=plan_import.errors,
+            )
+    await db.commit()
+    plans_performance_cache.invalidate(
+        plan["period"] for plan in plan_import.plans
+    )
+
+    return plan_import.result(mode, inserted)
+
+
+async def payments_insert(
+    file: UploadFile = File(...),
+    offset: int = Query(
+        0,
+        ge=0,
+        description="File rows to skip, as returned by a failed upload",
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    reader = csv.reader(
+        io.TextIOWrapper(file.file, encoding="utf-8"), delimiter="\t"
+    )
+    payment_import = PaymentImport(
+        set(await db.scalars(queries.credit_ids())),
+        set((await dictionaries.aget(db)).names),
+        PAYMENTS_INSERT_CHUNK_SIZE,
+    )
+    chunks = payment_import.chunks(reader, offset)
+    while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+        await payment_partitions.aensure(
+            payment["payment_date"] for payment in chunk
+        )
+        await db.execute(payment_import.insert_chunk(chunk))
+        await db.commit()
+        plans_performance_cache.invalidate(
+            payment["payment_date"] for payment in chunk
+        )
+    if payment_import.errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                "inserted": payment_import.inserted,
+                "offset": payment_import.offset,
+                "errors": payment_import.errors,
+            },
+        )
+
+    return {
+        "message": "Payments successfully added",
+        "inserted": payment_import.inserted,
+        "offset": payment_import.offset,
+    }
+
+
+async def get_plans_performance(
+    request: Request,
+    response: Response,
+    check_date: datetime.date = Query(
+        description="Date for checking plan execution in YYYY-MM-DD format",
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    month, _ = queries.month_range(check_date)
+    entry = plans_performance_cache.get(month)
+    if entry is None:
+        categories = await dictionaries.aget(db)
+        entry = plans_performance_cache.put(
+            month,
+            results.plans_performance_results(
+                await db.execute(
+                    queries.plans_performance(categories.ids, month, month)
+                ),
+                categories.names,
+            ),
+        )
+
+    return entry.respond(request, response)
+
+
+async def get_plans_performance_range(
+    from_date: datetime.date = Query(
+        alias="from",
+        description="Any date of the first month in YYYY-MM-DD format",
+    ),
+    to_date: datetime.date = Query(
+        alias="to",
+        description="Any date of the last month in YYYY-MM-DD format",
+    ),
+    cumulative: bool = Query(
+        False, description="Add year-to-date cumulative columns"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if from_date.replace(day=1) > to_date.replace(day=1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Start month must not be after end month",
+        )
+
+    categories = await dictionaries.aget(db)
+    return results.plans_performance_results(
+        await db.execute(
+            queries.plans_performance(
+                categories.ids, from_date, to_date, cumulative
+            )
+        ),
+        categories.names,
+    )
+
+
+async def get_portfolio_aging(db: AsyncSession = Depends(get_async_read_db)):
+    return results.portfolio_aging_results(
+        await db.execute(queries.portfolio_aging())
+    )
+
+
+ASYNC_ENDPOINTS = {
+    endpoint.__name__: endpoint
+    for endpoint in (
+        get_user_credit,
+        get_user_credit_batch,
+        get_user_credit_batch_file,
+        plans_insert,
+        payments_insert,
+        get_plans_performance,
+        get_plans_performance_range,
+        get_portfolio_aging,
+    )
+}
+
+router = APIRouter()
+
+for route in routers.router.routes:
+    router.add_api_route(
+        route.path,
+        ASYNC_ENDPOINTS.get(route.name, route.endpoint),
+        methods=route.methods,
+        response_model=route.response_model,
+        response_model_exclude_none=route.response_model_exclude_none,
+        status_code=route.status_code,
+        summary=route.summary,
+        description=route.description,
+        responses=route.responses,
+        name=route.name,
+    )
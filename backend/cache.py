@@ -0,0 +1,148 @@
+"""In-process response cache for /plans_performance.
+
+Entries are keyed by month, bounded to PLANS_PERFORMANCE_CACHE_SIZE
+months with least-recently-used eviction, and carry an ETag so repeated
+polls can be answered with 304 Not Modified. A month is dropped when
+plans for it are inserted, or when a session that wrote credits or
+payments of that month through the ORM commits; bulk write paths call
+invalidate() themselves. Entries also expire after
+PLANS_PERFORMANCE_CACHE_TTL seconds, which bounds staleness for writes
+made by other processes or workers.
+"""
+
+import datetime
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from backend.config import (
+    PLANS_PERFORMANCE_CACHE_SIZE,
+    PLANS_PERFORMANCE_CACHE_TTL,
+    PLANS_PERFORMANCE_MAX_AGE,
+)
+from backend.models import Credit, Payment
+
+
+def month_of(value) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    month: datetime.date
+    body: list
+    etag: str
+    stored_at: float
+
+    def headers(self) -> dict[str, str]:
+        if month_of(datetime.date.today()) > self.month:
+            cache_control = f"max-age={PLANS_PERFORMANCE_MAX_AGE}"
+        else:
+            # The current month still changes, so always revalidate
+            cache_control = "no-cache"
+        return {"ETag": self.etag, "Cache-Control": cache_control}
+
+    def respond(self, request: Request, response: Response):
+        headers = self.headers()
+        if _etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+            )
+        response.headers.update(headers)
+        return self.body
+
+
+def _etag_matches(if_none_match, etag) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {
+        candidate.strip().removeprefix("W/")
+        for candidate in if_none_match.split(",")
+    }
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, month: datetime.date) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(month)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at >= self.ttl:
+                del self._entries[month]
+                return None
+            self._entries.move_to_end(month)
+            return entry
+
+    def put(self, month: datetime.date, body: list) -> CacheEntry:
+        payload = json.dumps(jsonable_encoder(body), sort_keys=True)
+        entry = CacheEntry(
+            month=month,
+            body=body,
+            etag=f'"{hashlib.sha1(payload.encode()).hexdigest()}"',
+            stored_at=time.monotonic(),
+        )
+        with self._lock:
+            self._entries[month] = entry
+            self._entries.move_to_end(month)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, dates):
+        months = {month_of(date) for date in dates}
+        with self._lock:
+            for month in months:
+                self._entries.pop(month, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+plans_performance_cache = ResponseCache(
+    PLANS_PERFORMANCE_CACHE_SIZE, PLANS_PERFORMANCE_CACHE_TTL
+)
+
+_DATE_ATTRIBUTES = {Credit: "issuance_date", Payment: "payment_date"}
+
+
+@event.listens_for(Credit, "after_insert")
+@event.listens_for(Credit, "after_update")
+@event.listens_for(Credit, "after_delete")
+@event.listens_for(Payment, "after_insert")
+@event.listens_for(Payment, "after_update")
+@event.listens_for(Payment, "after_delete")
+def _collect_changed_months(mapper, connection, target):
+    history = inspect(target).attrs[_DATE_ATTRIBUTES[mapper.class_]].history
+    dates = [*history.unchanged, *history.added, *history.deleted]
+    months = object_session(target).info.setdefault("changed_months", set())
+    months.update(month_of(date) for date in dates if date is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_months(session):
+    months = session.info.pop("changed_months", None)
+    if months:
+        plans_performance_cache.invalidate(months)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_months(session):
+    session.info.pop("changed_months", None)
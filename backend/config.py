@@ -11,3 +11,70 @@ HOST_DB = os.getenv("POSTGRES_HOST")
 PORT_DB = os.getenv("POSTGRES_PORT")
 
 DATABASE_URL = f"postgresql+psycopg2://{USER_DB}:{PASSWORD_DB}@{HOST_DB}:{PORT_DB}/{NAME_DB}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{USER_DB}:{PASSWORD_DB}@{HOST_DB}:{PORT_DB}/{NAME_DB}"
+
+# Optional streaming replica that serves the read-only endpoints
+REPLICA_HOST_DB = os.getenv("POSTGRES_REPLICA_HOST")
+REPLICA_PORT_DB = os.getenv("POSTGRES_REPLICA_PORT", PORT_DB)
+REPLICA_DATABASE_URL = ASYNC_REPLICA_DATABASE_URL = None
+if REPLICA_HOST_DB:
+    REPLICA_DATABASE_URL = f"postgresql+psycopg2://{USER_DB}:{PASSWORD_DB}@{REPLICA_HOST_DB}:{REPLICA_PORT_DB}/{NAME_DB}"
+    ASYNC_REPLICA_DATABASE_URL = f"postgresql+asyncpg://{USER_DB}:{PASSWORD_DB}@{REPLICA_HOST_DB}:{REPLICA_PORT_DB}/{NAME_DB}"
+# Seconds of replay lag after which reads go back to the primary
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 5))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", 2))
+
+# Serve the endpoints from backend.async_routers (AsyncSession + asyncpg)
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+
+USER_CREDIT_BATCH_SIZE = int(os.getenv("USER_CREDIT_BATCH_SIZE", 1000))
+# Largest page of credits /user_credit returns
+USER_CREDIT_PAGE_LIMIT = int(os.getenv("USER_CREDIT_PAGE_LIMIT", 1000))
+
+DICTIONARY_CACHE_TTL = float(os.getenv("DICTIONARY_CACHE_TTL", 300))
+
+PLANS_PERFORMANCE_CACHE_SIZE = int(
+    os.getenv("PLANS_PERFORMANCE_CACHE_SIZE", 256)
+)
+PLANS_PERFORMANCE_CACHE_TTL = float(
+    os.getenv("PLANS_PERFORMANCE_CACHE_TTL", 300)
+)
+# Cache-Control max-age for months that are already closed
+PLANS_PERFORMANCE_MAX_AGE = int(os.getenv("PLANS_PERFORMANCE_MAX_AGE", 3600))
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 5000))
+
+# Statements slower than this are logged to "backend.slow_queries"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+# Seconds to wait for a connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Seconds after which a connection is replaced, -1 keeps it forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Open a connection per checkout and leave pooling to PgBouncer
+DB_EXTERNAL_POOLER = os.getenv("DB_EXTERNAL_POOLER", "false").lower() == "true"
+
+# Payments inserted and committed per transaction by /payments_insert
+PAYMENTS_INSERT_CHUNK_SIZE = int(
+    os.getenv("PAYMENTS_INSERT_CHUNK_SIZE", 10000)
+)
+
+# Monthly payments partitions created ahead of the current month
+PAYMENT_PARTITIONS_AHEAD = int(os.getenv("PAYMENT_PARTITIONS_AHEAD", 3))
+
+# Background import jobs: worker threads, jobs accepted before uploads are
+# refused with 503, finished jobs kept for status polling, and the
+# directory uploads are spooled to (the system temp directory if unset)
+IMPORT_JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", 2))
+IMPORT_JOB_QUEUE_SIZE = int(os.getenv("IMPORT_JOB_QUEUE_SIZE", 10))
+IMPORT_JOB_HISTORY = int(os.getenv("IMPORT_JOB_HISTORY", 100))
+IMPORT_JOB_DIR = os.getenv("IMPORT_JOB_DIR")
+
+# Collections forecast: recent vintages pooled into the repayment curve of
+# every month on book, and the longest horizon /collections_forecast takes
+FORECAST_VINTAGES = int(os.getenv("FORECAST_VINTAGES", 12))
+FORECAST_MAX_MONTHS = int(os.getenv("FORECAST_MAX_MONTHS", 24))
@@ -0,0 +1,145 @@
+"""Payment totals stored on credits.
+
+paid_body, paid_percent, total_paid, payments_count and last_payment_date
+are kept up to date by the statement-level triggers installed in the
+"credit payment totals" migration. Run this module to compare them with
+the payments table, or to recompute them after a bulk load that bypassed
+the triggers:
+
+    python -m backend.credit_totals --check
+    python -m backend.credit_totals
+
+Both compare with the payments still attached to the payments table:
+credits with payments in detached partitions (see backend.partitions)
+are reported as stale, and a rebuild drops those payments from them.
+"""
+
+import argparse
+import logging
+import sys
+
+from sqlalchemy import exists, func, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models import Credit, Dictionary, Payment
+from backend.queries import BODY_PAYMENT_TYPE, PERCENT_PAYMENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+# Sums are accumulated in a different order by the triggers, so stored
+# floats may differ from a fresh sum in the last digits.
+TOLERANCE = 0.005
+
+
+def _totals():
+    def paid(*names):
+        paid = func.sum(Payment.sum)
+        if names:
+            paid = paid.filter(Dictionary.name.in_(names))
+        return func.coalesce(paid, 0)
+
+    return (
+        select(
+            Payment.credit_id,
+            paid(BODY_PAYMENT_TYPE).label("paid_body"),
+            paid(PERCENT_PAYMENT_TYPE).label("paid_percent"),
+            paid().label("total_paid"),
+            func.count(Payment.id).label("payments_count"),
+            func.max(Payment.payment_date).label("last_payment_date"),
+        )
+        .outerjoin(Dictionary, Dictionary.id == Payment.type_id)
+        .group_by(Payment.credit_id)
+        .subquery()
+    )
+
+
+def check_credit_totals(db: Session) -> list[int]:
+    """Return the IDs of credits whose stored totals are out of date."""
+    totals = _totals()
+
+    def differs(column, expected):
+        return func.abs(column - func.coalesce(expected, 0)) > TOLERANCE
+
+    return list(
+        db.scalars(
+            select(Credit.id)
+            .outerjoin(totals, totals.c.credit_id == Credit.id)
+            .where(
+                or_(
+                    differs(Credit.paid_body, totals.c.paid_body),
+                    differs(Credit.paid_percent, totals.c.paid_percent),
+                    differs(Credit.total_paid, totals.c.total_paid),
+                    Credit.payments_count
+                    != func.coalesce(totals.c.payments_count, 0),
+                    Credit.last_payment_date.is_distinct_from(
+                        totals.c.last_payment_date
+                    ),
+                )
+            )
+            .order_by(Credit.id)
+        )
+    )
+
+
+def rebuild_credit_totals(db: Session):
+    # Block payment writers until commit so no trigger update is lost.
+    db.execute(text("LOCK TABLE payments IN SHARE MODE"))
+    db.execute(
+        update(Credit)
+        .where(~exists().where(Payment.credit_id == Credit.id))
+        .values(
+            paid_body=0,
+            paid_percent=0,
+            total_paid=0,
+            payments_count=0,
+            last_payment_date=None,
+        )
+    )
+    totals = _totals()
+    db.execute(
+        update(Credit)
+        .where(Credit.id == totals.c.credit_id)
+        .values(
+            paid_body=totals.c.paid_body,
+            paid_percent=totals.c.paid_percent,
+            total_paid=totals.c.total_paid,
+            payments_count=totals.c.payments_count,
+            last_payment_date=totals.c.last_payment_date,
+        )
+    )
+    db.commit()
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Check or rebuild the payment totals stored on credits."
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report credits with stale totals, exit with 1 if any",
+    )
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.check:
+            stale = check_credit_totals(db)
+            if stale:
+                logger.error(
+                    f"{len(stale)} credits have stale totals, "
+                    f"first IDs: {stale[:20]}"
+                )
+                sys.exit(1)
+            logger.info("Credit totals are consistent")
+            return
+        logger.info("Rebuilding credit totals...")
+        rebuild_credit_totals(db)
+        logger.info("Credit totals rebuilt")
+
+
+if __name__ == "__main__":
+    main()
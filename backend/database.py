@@ -2,15 +2,82 @@ import logging
 import os
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from backend.config import DATABASE_URL
+from backend.config import (
+    ASYNC_DATABASE_URL,
+    ASYNC_REPLICA_DATABASE_URL,
+    DATABASE_URL,
+    REPLICA_CHECK_INTERVAL,
+    REPLICA_CONNECT_TIMEOUT,
+    REPLICA_DATABASE_URL,
+    REPLICA_MAX_LAG,
+)
+from backend.pooling import engine_options
+from backend.replica import ReplicaStatus
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **engine_options(is_async=True)
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False, expire_on_commit=False, bind=async_engine
+)
+
+read_engine = async_read_engine = None
+if REPLICA_DATABASE_URL:
+    # Pre-ping, so a replica that went down fails at checkout, where the
+    # read sessions fall back to the primary
+    read_engine = create_engine(
+        REPLICA_DATABASE_URL,
+        **engine_options(
+            connect_timeout=REPLICA_CONNECT_TIMEOUT, pre_ping=True
+        ),
+    )
+    async_read_engine = create_async_engine(
+        ASYNC_REPLICA_DATABASE_URL,
+        **engine_options(
+            is_async=True,
+            connect_timeout=REPLICA_CONNECT_TIMEOUT,
+            pre_ping=True,
+        ),
+    )
+
+replica_status = ReplicaStatus(REPLICA_MAX_LAG, REPLICA_CHECK_INTERVAL)
+if read_engine is not None:
+    event.listen(engine, "commit", replica_status.wrote)
+    event.listen(async_engine.sync_engine, "commit", replica_status.wrote)
+
+
+def read_bind():
+    """Return the replica engine while it is usable, else the primary."""
+    return read_engine if replica_status.usable(read_engine) else engine
+
+
+async def async_read_bind():
+    if await replica_status.ausable(async_read_engine):
+        return async_read_engine
+    return async_engine
+
+
+def read_connect():
+    """Connect to the replica while it is usable, else, or if connecting
+    fails, to the primary."""
+    if read_bind() is engine:
+        return engine.connect()
+    try:
+        return read_engine.connect()
+    except (DBAPIError, OSError):
+        replica_status.unreachable()
+        return engine.connect()
+
 
 def get_db():
     db = SessionLocal()
@@ -18,3 +85,38 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    """Session for read-only endpoints, see backend.replica."""
+    db = SessionLocal(bind=read_bind())
+    if db.get_bind() is read_engine:
+        try:
+            db.connection()
+        except (DBAPIError, OSError):
+            db.close()
+            replica_status.unreachable()
+            db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    bind = await async_read_bind()
+    db = AsyncSessionLocal(bind=bind)
+    if bind is async_read_engine:
+        try:
+            await db.connection()
+        except (DBAPIError, OSError):
+            await db.close()
+            replica_status.unreachable()
+            db = AsyncSessionLocal()
+    async with db:
+        yield db
@@ -0,0 +1,83 @@
+"""Process-wide cache of the dictionaries table.
+
+Routers resolve plan categories and payment types to integer IDs through
+this cache instead of joining or querying dictionaries on every request.
+The cache is loaded at startup, dropped when a transaction that wrote a
+Dictionary row through the ORM commits, and reloaded after
+DICTIONARY_CACHE_TTL seconds as a safety net for changes made by other
+processes.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from backend.config import DICTIONARY_CACHE_TTL
+from backend.models import Dictionary
+
+# Reloads happen inside whichever request finds the cache stale, so they
+# are tagged as infrastructure for per-request statement checks.
+DICTIONARIES_QUERY = select(Dictionary.name, Dictionary.id).execution_options(
+    infrastructure=True
+)
+
+
+@dataclass(frozen=True)
+class Dictionaries:
+    ids: dict[str, int] = field(default_factory=dict)
+    names: dict[int, str] = field(default_factory=dict)
+
+
+class DictionaryCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._dictionaries = None
+        self._loaded_at = 0.0
+
+    @property
+    def _fresh(self) -> bool:
+        return (
+            self._dictionaries is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def _store(self, rows) -> Dictionaries:
+        ids = {name: id for name, id in rows}
+        self._dictionaries = Dictionaries(
+            ids=ids, names={id: name for name, id in ids.items()}
+        )
+        self._loaded_at = time.monotonic()
+        return self._dictionaries
+
+    def get(self, db: Session) -> Dictionaries:
+        if self._fresh:
+            return self._dictionaries
+        return self._store(db.execute(DICTIONARIES_QUERY).all())
+
+    async def aget(self, db: AsyncSession) -> Dictionaries:
+        if self._fresh:
+            return self._dictionaries
+        rows = await db.execute(DICTIONARIES_QUERY)
+        return self._store(rows.all())
+
+    def invalidate(self):
+        self._dictionaries = None
+
+
+dictionaries = DictionaryCache(DICTIONARY_CACHE_TTL)
+
+
+@event.listens_for(Dictionary, "after_insert")
+@event.listens_for(Dictionary, "after_update")
+@event.listens_for(Dictionary, "after_delete")
+def _mark_dictionaries_changed(mapper, connection, target):
+    object_session(target).info["dictionaries_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_dictionaries(session):
+    if session.info.pop("dictionaries_changed", False):
+        dictionaries.invalidate()
@@ -0,0 +1,53 @@
+"""Streaming NDJSON/CSV serialization of large result sets.
+
+Rows are read through a server-side cursor in EXPORT_BATCH_SIZE batches
+and written out as plain tuples, so memory stays flat no matter how many
+rows are exported and the first batch is sent as soon as it is fetched.
+The generator owns its connection because the response body is produced
+after the request's Session dependency has been closed.
+"""
+
+import csv
+import datetime
+import io
+import json
+
+from backend.config import EXPORT_BATCH_SIZE
+from backend.database import read_connect
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson(keys, rows):
+    return "".join(
+        json.dumps(dict(zip(keys, map(_json_value, row))), ensure_ascii=False)
+        + "\n"
+        for row in rows
+    )
+
+
+def _csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_rows(statement, export_format: str):
+    with read_connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, max_row_buffer=EXPORT_BATCH_SIZE
+        ).execute(statement)
+        keys = list(result.keys())
+        if export_format == "csv":
+            yield _csv([keys])
+        for rows in result.partitions(EXPORT_BATCH_SIZE):
+            if export_format == "csv":
+                yield _csv(rows)
+            else:
+                yield _ndjson(keys, rows)
@@ -0,0 +1,317 @@
+"""Set-based import of plan and payment files.
+
+A plan file is parsed and validated as a whole before the database is
+touched and written with one INSERT; nothing is written while any error
+exists. In the default insert mode existing plans are looked up for all
+(period, category) pairs with one query and reported as errors, the
+upsert and skip modes resolve them with ON CONFLICT instead.
+
+Payment files can be much larger, so they are parsed as a stream and
+handed out in chunks that the routers insert and commit one by one. The
+import stops at the first chunk with an invalid row; offset then tells
+how many rows are committed, so the upload can be resumed from there.
+
+Errors carry the 1-based row number of the file. A file that is not
+valid UTF-8 ends the parse with an error at the first row that could
+not be read. Only statements are built here, so the sync and async
+routers share it.
+"""
+
+import datetime
+import math
+
+from sqlalchemy import (
+    DateTime,
+    Float,
+    Integer,
+    and_,
+    bindparam,
+    func,
+    insert,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from backend.models import Dictionary, Payment, Plan
+
+UNIQUE_PLAN = "uq_plans_period_category_id"
+
+
+def _unnest(columns: dict, rows: list[dict]):
+    """Select rows from one array parameter per column, so a statement
+    stays the same size no matter how many rows it carries."""
+    return (
+        func.unnest(
+            *(
+                bindparam(
+                    name, [row[name] for row in rows], type_=ARRAY(type_)
+                )
+                for name, type_ in columns.items()
+            )
+        )
+        .table_valued(*columns)
+        .render_derived()
+    )
+
+
+def _rows(reader, errors: list):
+    """Enumerate the rows of reader, ending with an error instead of
+    raising when the file cannot be decoded."""
+    row_number = 0
+    try:
+        for row_number, row in enumerate(reader, start=1):
+            yield row_number, row
+    except UnicodeDecodeError:
+        errors.append((row_number + 1, "File must be UTF-8 encoded"))
+
+
+def _is_id(value: str) -> bool:
+    # isdigit() alone also accepts digits int() rejects, such as "²"
+    return value.isascii() and value.isdigit()
+
+
+class PlanImport:
+    def __init__(self, categories: dict[str, int]):
+        self.categories = categories
+        self.plans = []
+        self._errors = []
+        self._rows = {}
+
+    @property
+    def errors(self) -> list[str]:
+        return [
+            f"Row {row_number}: {message}"
+            for row_number, message in sorted(self._errors)
+        ]
+
+    def parse(self, reader):
+        for row_number, row in _rows(reader, self._errors):
+            if row:
+                self._parse_row(row_number, row)
+
+    def _parse_row(self, row_number, row):
+        errors = len(self._errors)
+        if len(row) < 3:
+            self._errors.append(
+                (row_number, "Please input the correct document structure")
+            )
+            return
+        period, sum, category_name = row[0], row[1], row[2]
+
+        try:
+            period = datetime.datetime.strptime(period, "%d.%m.%Y")
+        except ValueError:
+            self._errors.append(
+                (row_number, f"Period {period} must be in DD.MM.YYYY format")
+            )
+            return
+        if period.day != 1:
+            self._errors.append(
+                (
+                    row_number,
+                    f"Period {period.date()} must be the first day of the month",
+                )
+            )
+        # isdigit() alone also accepts digits float() rejects, such as "²"
+        if not (sum.isascii() and sum.isdigit()):
+            self._errors.append((row_number, f"Sum must be number {sum}"))
+        category_id = self.categories.get(category_name)
+        if category_id is None:
+            self._errors.append(
+                (row_number, f"Unknown category {category_name}")
+            )
+        elif (period, category_id) in self._rows:
+            self._errors.append(
+                (
+                    row_number,
+                    f"Plan with period {period.date()} and category "
+                    f"{category_name} repeats row "
+                    f"{self._rows[(period, category_id)]}",
+                )
+            )
+        if len(self._errors) > errors:
+            return
+
+        self._rows[(period, category_id)] = row_number
+        self.plans.append(
+            {"period": period, "sum": float(sum), "category_id": category_id}
+        )
+
+    def existing_plans(self):
+        """Select already stored plans for any (period, category) pair of
+        the file. The pairs travel as two array parameters, so the
+        statement size does not grow with the file."""
+        periods, category_ids = zip(*self._rows) if self._rows else ((), ())
+        pairs = (
+            func.unnest(
+                bindparam("periods", list(periods), type_=ARRAY(DateTime)),
+                bindparam(
+                    "category_ids", list(category_ids), type_=ARRAY(Integer)
+                ),
+            )
+            .table_valued("period", "category_id")
+            .render_derived()
+        )
+        return (
+            select(Plan.period, Plan.category_id, Dictionary.name)
+            .join(
+                pairs,
+                and_(
+                    Plan.period == pairs.c.period,
+                    Plan.category_id == pairs.c.category_id,
+                ),
+            )
+            .join(Dictionary, Plan.category_id == Dictionary.id)
+        )
+
+    def insert_plans(self, mode: str = "insert"):
+        """Insert the plans with one statement. Conflicts with stored plans
+        of the same period and category are resolved by the unique
+        constraint: upsert overwrites their sum, skip keeps them and
+        insert fails. Returns one inserted flag per written plan."""
+        columns = {"period": DateTime, "sum": Float, "category_id": Integer}
+        statement = postgresql.insert(Plan).from_select(
+            list(columns), select(_unnest(columns, self.plans))
+        )
+        if mode == "upsert":
+            statement = statement.on_conflict_do_update(
+                constraint=UNIQUE_PLAN,
+                set_={"sum": statement.excluded.sum},
+            )
+        elif mode == "skip":
+            statement = statement.on_conflict_do_nothing(
+                constraint=UNIQUE_PLAN
+            )
+        # xmax is only set on rows that existed before the statement
+        return statement.returning(literal_column("xmax = 0"))
+
+    def result(self, mode: str, inserted: list[bool]) -> dict:
+        if mode == "insert":
+            return {"message": "Plans successfully added"}
+        added = sum(inserted)
+        if mode == "upsert":
+            return {
+                "message": "Plans successfully imported",
+                "inserted": added,
+                "updated": len(inserted) - added,
+            }
+        return {
+            "message": "Plans successfully imported",
+            "inserted": added,
+            "skipped": len(self.plans) - added,
+        }
+
+    def check_existing(self, rows):
+        for plan in rows:
+            self._errors.append(
+                (
+                    self._rows[(plan.period, plan.category_id)],
+                    f"Plan with period {plan.period.date()} and category "
+                    f"{plan.name} already exists",
+                )
+            )
+
+
+class PaymentImport:
+    def __init__(
+        self, credit_ids: set[int], type_ids: set[int], chunk_size: int
+    ):
+        self.credit_ids = credit_ids
+        self.type_ids = type_ids
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.inserted = 0
+        self._errors = []
+
+    @property
+    def errors(self) -> list[str]:
+        return [
+            f"Row {row_number}: {message}"
+            for row_number, message in self._errors
+        ]
+
+    def chunks(self, reader, offset: int = 0):
+        """Yield lists of at most chunk_size payments, skipping the first
+        offset rows. offset advances past a chunk once the caller asks
+        for the next one, i.e. after the chunk has been committed."""
+        self.offset = offset
+        chunk = []
+        parsed = 0
+        row_number = offset
+        for row_number, row in _rows(reader, self._errors):
+            if row_number <= offset:
+                continue
+            if row:
+                parsed += 1
+                self._parse_row(row_number, row, chunk)
+            if parsed == self.chunk_size:
+                if self._errors:
+                    return
+                yield chunk
+                self.inserted += len(chunk)
+                self.offset = row_number
+                chunk, parsed = [], 0
+        if self._errors:
+            return
+        if chunk:
+            yield chunk
+            self.inserted += len(chunk)
+        self.offset = row_number
+
+    @staticmethod
+    def insert_chunk(chunk):
+        """Insert a chunk with one statement, so the payment triggers run
+        once per chunk instead of once per row."""
+        columns = {
+            "credit_id": Integer,
+            "payment_date": DateTime,
+            "type_id": Integer,
+            "sum": Float,
+        }
+        return insert(Payment).from_select(
+            list(columns), select(_unnest(columns, chunk))
+        )
+
+    def _parse_row(self, row_number, row, chunk):
+        errors = len(self._errors)
+        if len(row) < 4:
+            self._errors.append(
+                (row_number, "Please input the correct document structure")
+            )
+            return
+        credit_id, payment_date, type_id, sum = row[0], row[1], row[2], row[3]
+
+        if not _is_id(credit_id) or int(credit_id) not in self.credit_ids:
+            self._errors.append((row_number, f"Unknown credit {credit_id}"))
+        try:
+            payment_date = datetime.datetime.strptime(payment_date, "%d.%m.%Y")
+        except ValueError:
+            self._errors.append(
+                (
+                    row_number,
+                    f"Payment date {payment_date} must be in DD.MM.YYYY format",
+                )
+            )
+        if not _is_id(type_id) or int(type_id) not in self.type_ids:
+            self._errors.append(
+                (row_number, f"Unknown payment type {type_id}")
+            )
+        try:
+            sum = float(sum)
+        except ValueError:
+            sum = math.nan
+        if not math.isfinite(sum):
+            self._errors.append((row_number, f"Sum must be number {row[3]}"))
+        if len(self._errors) > errors:
+            return
+
+        chunk.append(
+            {
+                "credit_id": int(credit_id),
+                "payment_date": payment_date,
+                "type_id": int(type_id),
+                "sum": sum,
+            }
+        )
@@ -0,0 +1,171 @@
+"""Per-request SQL instrumentation.
+
+Engine events count every statement executed while a request is being
+handled, together with its duration and the rows it returned. The HTTP
+middleware exposes the totals of the request in a Server-Timing header
+and folds them into per-endpoint metrics served by /metrics. Statements
+slower than SLOW_QUERY_MS are logged to the "backend.slow_queries"
+logger.
+"""
+
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from fastapi import Request
+from sqlalchemy import event
+
+from backend.config import SLOW_QUERY_MS
+
+slow_query_logger = logging.getLogger("backend.slow_queries")
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_time: float = 0.0
+    rows: int = 0
+    slowest_time: float = 0.0
+    slowest_statement: str | None = None
+
+    def record(self, statement: str, elapsed: float, rows: int):
+        self.statements += 1
+        self.db_time += elapsed
+        self.rows += max(rows, 0)
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    record_statement(statement, parameters, elapsed, cursor.rowcount)
+
+
+def record_statement(statement, parameters, elapsed: float, rows: int):
+    """Count a statement in the current request and log it if slow.
+
+    Called by the engine events, and directly for statements run on a raw
+    DBAPI cursor (e.g. COPY), which bypass them.
+    """
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed, rows)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            "Slow query (%.1f ms): %s | parameters: %.500r",
+            elapsed * 1000,
+            statement,
+            parameters,
+        )
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is None or context.is_pre_ping:
+        return
+    started = context.connection.info.get("query_started")
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def add(self, endpoint: str, stats: RequestStats, elapsed: float):
+        with self._lock:
+            metrics = self._endpoints.setdefault(
+                endpoint,
+                {
+                    "requests": 0,
+                    "statements": 0,
+                    "rows": 0,
+                    "db_time_ms": 0.0,
+                    "total_time_ms": 0.0,
+                    "max_statements": 0,
+                    "slowest_statement_ms": 0.0,
+                    "slowest_statement": None,
+                },
+            )
+            metrics["requests"] += 1
+            metrics["statements"] += stats.statements
+            metrics["rows"] += stats.rows
+            metrics["db_time_ms"] += stats.db_time * 1000
+            metrics["total_time_ms"] += elapsed * 1000
+            metrics["max_statements"] = max(
+                metrics["max_statements"], stats.statements
+            )
+            if stats.slowest_time * 1000 > metrics["slowest_statement_ms"]:
+                metrics["slowest_statement_ms"] = stats.slowest_time * 1000
+                metrics["slowest_statement"] = stats.slowest_statement
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    **metrics,
+                    "avg_statements": metrics["statements"]
+                    / metrics["requests"],
+                    "avg_db_time_ms": metrics["db_time_ms"]
+                    / metrics["requests"],
+                    "avg_total_time_ms": metrics["total_time_ms"]
+                    / metrics["requests"],
+                }
+                for endpoint, metrics in self._endpoints.items()
+            }
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+def server_timing(stats: RequestStats, elapsed: float) -> str:
+    return ", ".join(
+        [
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} '
+            f'statements, {stats.rows} rows"',
+            f"db-slowest;dur={stats.slowest_time * 1000:.2f}",
+            f"app;dur={elapsed * 1000:.2f}",
+        ]
+    )
+
+
+async def middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_stats.reset(token)
+    elapsed = time.perf_counter() - started
+
+    response.headers["Server-Timing"] = server_timing(stats, elapsed)
+    # Unmatched paths share one entry, so scans of random URLs do not grow
+    # the metrics
+    route = request.scope.get("route")
+    endpoint = f"{request.method} {route.path if route else '<unmatched>'}"
+    endpoint_metrics.add(endpoint, stats, elapsed)
+    return response
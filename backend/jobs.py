@@ -0,0 +1,226 @@
+"""Background execution of plan and payment imports.
+
+The /plans_insert/jobs and /payments_insert/jobs endpoints spool the
+upload to IMPORT_JOB_DIR and answer with a queued job right away, so a
+large file holds neither a request worker nor a transaction while the
+client waits. IMPORT_JOB_WORKERS threads run the imports with the same
+validation and writes as /plans_insert and /payments_insert, counting
+rows parsed, validated and inserted as they go; clients poll
+/import_jobs/{job_id} for the progress, the row-level errors and the
+result. Once IMPORT_JOB_QUEUE_SIZE jobs are queued or running, further
+uploads are refused until one finishes.
+
+Jobs are kept in the memory of the process that accepted them: they are
+lost on restart, and with several app processes a job can only be polled
+through the process that runs it. The last IMPORT_JOB_HISTORY finished
+jobs stay available for polling.
+"""
+
+import csv
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from sqlalchemy.exc import IntegrityError
+
+from backend import queries
+from backend.cache import plans_performance_cache
+from backend.config import (
+    IMPORT_JOB_DIR,
+    IMPORT_JOB_HISTORY,
+    IMPORT_JOB_QUEUE_SIZE,
+    IMPORT_JOB_WORKERS,
+    PAYMENTS_INSERT_CHUNK_SIZE,
+)
+from backend.database import SessionLocal
+from backend.dictionaries import dictionaries
+from backend.imports import PaymentImport, PlanImport
+from backend.partitions import payment_partitions
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+@dataclass
+class ImportJob:
+    kind: str
+    path: str
+    options: dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    rows_parsed: int = 0
+    rows_validated: int = 0
+    rows_inserted: int = 0
+    errors: list[str] = field(default_factory=list)
+    result: dict | None = None
+    created_at: datetime.datetime = field(default_factory=_now)
+    started_at: datetime.datetime | None = None
+    finished_at: datetime.datetime | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def count(self, rows):
+        for row in rows:
+            self.rows_parsed += 1
+            yield row
+
+    def snapshot(self) -> dict:
+        snapshot = asdict(self)
+        del snapshot["path"], snapshot["options"]
+        snapshot["errors"] = list(self.errors)
+        return snapshot
+
+
+def _import_plans(job: ImportJob, db, rows):
+    mode = job.options["mode"]
+    plan_import = PlanImport(dictionaries.get(db).ids)
+    plan_import.parse(job.count(rows))
+    job.rows_validated = len(plan_import.plans)
+    if mode == "insert" and plan_import.plans:
+        plan_import.check_existing(db.execute(plan_import.existing_plans()))
+    if plan_import.errors:
+        job.errors = plan_import.errors
+        return
+
+    inserted = []
+    if plan_import.plans:
+        try:
+            inserted = db.scalars(plan_import.insert_plans(mode)).all()
+        except IntegrityError:
+            # Another upload stored some of the plans after the check
+            db.rollback()
+            plan_import.check_existing(
+                db.execute(plan_import.existing_plans())
+            )
+            if not plan_import.errors:
+                raise
+            job.errors = plan_import.errors
+            return
+    db.commit()
+    plans_performance_cache.invalidate(
+        plan["period"] for plan in plan_import.plans
+    )
+    job.rows_inserted = len(inserted)
+    job.result = plan_import.result(mode, inserted)
+
+
+def _import_payments(job: ImportJob, db, rows):
+    payment_import = PaymentImport(
+        set(db.scalars(queries.credit_ids())),
+        set(dictionaries.get(db).names),
+        PAYMENTS_INSERT_CHUNK_SIZE,
+    )
+    for chunk in payment_import.chunks(job.count(rows), job.options["offset"]):
+        job.rows_validated += len(chunk)
+        payment_partitions.ensure(payment["payment_date"] for payment in chunk)
+        db.execute(payment_import.insert_chunk(chunk))
+        db.commit()
+        plans_performance_cache.invalidate(
+            payment["payment_date"] for payment in chunk
+        )
+        job.rows_inserted += len(chunk)
+    job.errors = payment_import.errors
+    job.result = {
+        "inserted": payment_import.inserted,
+        "offset": payment_import.offset,
+    }
+    if not job.errors:
+        job.result["message"] = "Payments successfully added"
+
+
+IMPORTS = {"plans": _import_plans, "payments": _import_payments}
+
+
+class ImportJobs:
+    def __init__(self, workers: int, queue_size: int, history: int):
+        self.queue_size = queue_size
+        self.history = history
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="import-job"
+        )
+        self._jobs = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, file, **options) -> ImportJob | None:
+        """Spool the file and queue its import. Returns None when the
+        queue is full."""
+        with self._lock:
+            if self._active >= self.queue_size:
+                return None
+            self._active += 1
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=IMPORT_JOB_DIR,
+                prefix=f"{kind}_",
+                suffix=".csv",
+                delete=False,
+            ) as spool:
+                shutil.copyfileobj(file, spool)
+            job = ImportJob(kind, spool.name, options)
+            with self._lock:
+                self._jobs[job.id] = job
+            self._executor.submit(self._run, job)
+        except BaseException:
+            with self._lock:
+                self._active -= 1
+            raise
+        return job
+
+    def get(self, job_id: str) -> ImportJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ImportJob):
+        job.status, job.started_at = "running", _now()
+        logger.info(f"Import job {job.id} ({job.kind}) started")
+        try:
+            with (
+                SessionLocal() as db,
+                open(job.path, encoding="utf-8", newline="") as file,
+            ):
+                IMPORTS[job.kind](job, db, csv.reader(file, delimiter="\t"))
+        except Exception:
+            logger.exception(f"Import job {job.id} ({job.kind}) crashed")
+            job.errors = ["An error occurred while processing the file."]
+        finally:
+            os.remove(job.path)
+            job.finished_at = _now()
+            job.status = "failed" if job.errors else "succeeded"
+            logger.info(
+                f"Import job {job.id} {job.status}: {job.rows_parsed} rows "
+                f"parsed, {job.rows_inserted} inserted"
+            )
+            with self._lock:
+                self._active -= 1
+                self._forget_finished()
+
+    def _forget_finished(self):
+        finished = [job.id for job in self._jobs.values() if job.finished]
+        for job_id in finished[: max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        """Let running jobs finish and drop the queued ones."""
+        self._executor.shutdown(cancel_futures=True)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == "queued":
+                    os.remove(job.path)
+
+
+import_jobs = ImportJobs(
+    IMPORT_JOB_WORKERS, IMPORT_JOB_QUEUE_SIZE, IMPORT_JOB_HISTORY
+)
@@ -1,7 +1,58 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from backend import routers
+from backend import async_routers, instrumentation, routers
+from backend.config import DB_ASYNC
+from backend.database import (
+    SessionLocal,
+    async_engine,
+    async_read_bind,
+    async_read_engine,
+    engine,
+    read_bind,
+    read_engine,
+)
+from backend.dictionaries import dictionaries
+from backend.jobs import import_jobs
+from backend.partitions import months_ahead, payment_partitions
+from backend.startup import StartupTimer, awarm_pool, warm_pool
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    timer = StartupTimer()
+    with timer.phase("pool"):
+        if DB_ASYNC:
+            await awarm_pool(async_engine)
+        else:
+            warm_pool(engine)
+    with timer.phase("dictionaries"):
+        with SessionLocal() as db:
+            dictionaries.get(db)
+    if read_engine is not None:
+        with timer.phase("replica"):
+            if DB_ASYNC:
+                await async_read_bind()
+            else:
+                read_bind()
+    with timer.phase("partitions"):
+        payment_partitions.ensure(months_ahead())
+    timer.report()
+    yield
+    import_jobs.shutdown()
+
+
+instrumentation.instrument_engine(engine)
+instrumentation.instrument_engine(async_engine.sync_engine)
+if read_engine is not None:
+    instrumentation.instrument_engine(read_engine)
+    instrumentation.instrument_engine(async_read_engine.sync_engine)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.middleware("http")(instrumentation.middleware)
 
-app.include_router(routers.router)
+app.include_router(async_routers.router if DB_ASYNC else routers.router)
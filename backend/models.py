@@ -1,6 +1,16 @@
 import datetime
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, relationship
 
 
@@ -20,16 +30,41 @@ class User(Base):
 
 class Credit(Base):
     __tablename__ = "credits"
+    # Serves a user's credits in keyset order; also covers user_id lookups
+    __table_args__ = (
+        Index(
+            "ix_credits_user_id_issuance_date_id",
+            "user_id",
+            "issuance_date",
+            "id",
+        ),
+        # Active credits only, covering the portfolio aging report
+        Index(
+            "ix_credits_active_return_date",
+            "return_date",
+            postgresql_where=text("actual_return_date IS NULL"),
+            postgresql_include=[
+                "body",
+                "percent",
+                "paid_body",
+                "paid_percent",
+            ],
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    issuance_date = Column(DateTime, nullable=False)
+    issuance_date = Column(DateTime, index=True, nullable=False)
     return_date = Column(DateTime, nullable=False)
     actual_return_date = Column(DateTime, nullable=True)
     body = Column(Float, nullable=False)
     percent = Column(Float, nullable=False)
-    user_id = Column(
-        Integer, ForeignKey("users.id"), index=True, nullable=False
-    )
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Payment totals, maintained by triggers on payments
+    paid_body = Column(Float, nullable=False, server_default="0")
+    paid_percent = Column(Float, nullable=False, server_default="0")
+    total_paid = Column(Float, nullable=False, server_default="0")
+    payments_count = Column(Integer, nullable=False, server_default="0")
+    last_payment_date = Column(DateTime, nullable=True)
 
     user = relationship("User", back_populates="credits")
     payments = relationship("Payment", back_populates="credit")
@@ -47,9 +82,14 @@ class Dictionary(Base):
 
 class Plan(Base):
     __tablename__ = "plans"
+    __table_args__ = (
+        UniqueConstraint(
+            "period", "category_id", name="uq_plans_period_category_id"
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    period = Column(DateTime, nullable=False)
+    period = Column(DateTime, index=True, nullable=False)
     sum = Column(Float, nullable=False)
     category_id = Column(
         Integer, ForeignKey("dictionaries.id"), index=True, nullable=False
@@ -60,10 +100,15 @@ class Plan(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    # Monthly partitions are created by backend.partitions
+    __table_args__ = {"postgresql_partition_by": "RANGE (payment_date)"}
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     sum = Column(Float, nullable=False)
-    payment_date = Column(DateTime, nullable=False)
+    # Part of the primary key, as the partition key must be
+    payment_date = Column(
+        DateTime, primary_key=True, index=True, nullable=False
+    )
     credit_id = Column(
         Integer,
         ForeignKey("credits.id", ondelete="CASCADE"),
@@ -79,3 +124,24 @@ class Payment(Base):
 
     credit = relationship("Credit", back_populates="payments")
     payment_type = relationship("Dictionary", back_populates="payments")
+
+
+class MonthlyIssuance(Base):
+    __tablename__ = "monthly_issuance"
+
+    month = Column(DateTime, primary_key=True)
+    credits_count = Column(Integer, nullable=False, default=0)
+    body_sum = Column(Float, nullable=False, default=0)
+
+
+class MonthlyCollection(Base):
+    __tablename__ = "monthly_collections"
+
+    month = Column(DateTime, primary_key=True)
+    type_id = Column(
+        Integer,
+        ForeignKey("dictionaries.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    payments_count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0)
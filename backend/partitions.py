@@ -0,0 +1,185 @@
+"""Monthly partitions of the payments table.
+
+payments is range-partitioned by payment_date, one payments_YYYY_MM
+partition per month, so queries filtered by a month of payment_date only
+scan that partition. Partitions are created by the
+create_payments_partition() function of the "partition payments by
+month" migration. Payments of a month without a partition land in
+payments_default until the month is created, which moves them over.
+
+The app creates partitions for the next PAYMENT_PARTITIONS_AHEAD months
+at startup and for every month a /payments_insert chunk touches. An old
+partition can be detached and archived without deleting its rows.
+
+Detaching does not touch the rollups or the credit totals, so reports
+still include the detached month, but only until something recomputes
+them from payments, which no longer has those rows:
+
+- updating or deleting a payment recomputes the totals of its credit
+  without the archived payments,
+- python -m backend.credit_totals --check reports every credit with
+  archived payments as stale,
+- python -m backend.rollups and python -m backend.credit_totals drop
+  the archived months and payments for good.
+
+Attach the partition back (ALTER TABLE payments ATTACH PARTITION
+payments_YYYY_MM FOR VALUES FROM (...) TO (...)) before any of these if
+its payments must keep counting.
+
+    python -m backend.partitions create 2024-01 --months 12
+    python -m backend.partitions split-default
+    python -m backend.partitions detach 2019-01
+"""
+
+import argparse
+import datetime
+import logging
+import threading
+
+from sqlalchemy import func, select, text
+
+from backend.cache import month_of
+from backend.config import PAYMENT_PARTITIONS_AHEAD
+from backend.database import async_engine, engine
+
+logger = logging.getLogger(__name__)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"payments_{month:%Y_%m}"
+
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    month_index = month.month - 1 + months
+    return month.replace(
+        year=month.year + month_index // 12, month=month_index % 12 + 1
+    )
+
+
+def months_ahead(
+    start: datetime.date | None = None, months: int = PAYMENT_PARTITIONS_AHEAD
+) -> list[datetime.date]:
+    start = month_of(start or datetime.date.today())
+    return [_add_months(start, offset) for offset in range(months + 1)]
+
+
+class PaymentPartitions:
+    """Create missing partitions, remembering the months already created.
+
+    Every month is created in its own committed transaction, so a rolled
+    back insert never leaves a month remembered without its partition.
+    """
+
+    def __init__(self):
+        self._months = set()
+        self._lock = threading.Lock()
+
+    def _missing(self, dates) -> list[datetime.date]:
+        months = {month_of(date) for date in dates}
+        with self._lock:
+            return sorted(months - self._months)
+
+    def _created(self, month):
+        with self._lock:
+            self._months.add(month)
+
+    def ensure(self, dates):
+        for month in self._missing(dates):
+            with engine.begin() as connection:
+                connection.execute(
+                    select(func.create_payments_partition(month))
+                )
+            self._created(month)
+
+    async def aensure(self, dates):
+        for month in self._missing(dates):
+            async with async_engine.begin() as connection:
+                await connection.execute(
+                    select(func.create_payments_partition(month))
+                )
+            self._created(month)
+
+
+payment_partitions = PaymentPartitions()
+
+
+def split_default(connection) -> list[datetime.date]:
+    """Create the partitions of every month stored in payments_default."""
+    months = connection.scalars(
+        text(
+            "SELECT DISTINCT date_trunc('month', payment_date)::date "
+            "FROM payments_default ORDER BY 1"
+        )
+    ).all()
+    for month in months:
+        connection.execute(select(func.create_payments_partition(month)))
+    return months
+
+
+def detach(connection, month: datetime.date):
+    """Detach a month's partition into a standalone table. Its payments
+    stay in the rollups and credit totals until those are recomputed, see
+    the module docstring."""
+    connection.execute(
+        text(f"ALTER TABLE payments DETACH PARTITION {partition_name(month)}")
+    )
+
+
+def _month(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, "%Y-%m").date()
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Manage monthly partitions of the payments table."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser(
+        "create", help="Create the partitions of a range of months"
+    )
+    create.add_argument("month", type=_month, help="First month, YYYY-MM")
+    create.add_argument(
+        "--months",
+        type=int,
+        default=PAYMENT_PARTITIONS_AHEAD,
+        help="Number of following months to create as well",
+    )
+    commands.add_parser(
+        "split-default",
+        help="Move payments from payments_default into monthly partitions",
+    )
+    detach_command = commands.add_parser(
+        "detach",
+        help="Detach a month's partition into a standalone table",
+    )
+    detach_command.add_argument("month", type=_month, help="Month, YYYY-MM")
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        if args.command == "create":
+            for month in months_ahead(args.month, args.months):
+                connection.execute(
+                    select(func.create_payments_partition(month))
+                )
+                logger.info(f"Partition {partition_name(month)} is ready")
+        elif args.command == "split-default":
+            months = split_default(connection)
+            logger.info(f"Created partitions for {len(months)} months")
+        else:
+            detach(connection, args.month)
+            logger.info(
+                f"Detached {partition_name(args.month)}, archive or drop it "
+                "as a standalone table"
+            )
+            logger.warning(
+                "Rebuilding the rollups or credit totals, and updating or "
+                "deleting payments of its credits, now drops its payments "
+                "from them"
+            )
+
+
+if __name__ == "__main__":
+    main()
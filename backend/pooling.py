@@ -0,0 +1,113 @@
+"""Connection pool configuration and statistics.
+
+Both engines use pools that time every checkout, so the time requests
+spend waiting for a connection can be read from /metrics/pool next to
+the live checked-out and overflow counts. With DB_EXTERNAL_POOLER the
+engines keep no connections of their own and leave pooling to PgBouncer;
+asyncpg's prepared statement caches are disabled in that mode because a
+transaction-mode pooler does not pin a server connection to a client.
+"""
+
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from backend.config import (
+    DB_EXTERNAL_POOLER,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+
+
+class _TimedCheckout:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time += elapsed
+                self.max_wait = max(self.max_wait, elapsed)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+def engine_options(
+    is_async: bool = False,
+    connect_timeout: int | None = None,
+    pre_ping: bool = DB_POOL_PRE_PING,
+) -> dict:
+    connect_args = {}
+    if connect_timeout is not None:
+        connect_args["timeout" if is_async else "connect_timeout"] = (
+            connect_timeout
+        )
+    options = {"pool_pre_ping": pre_ping, "connect_args": connect_args}
+    if DB_EXTERNAL_POOLER:
+        options["poolclass"] = TimedNullPool
+        if is_async:
+            connect_args.update(
+                statement_cache_size=0, prepared_statement_cache_size=0
+            )
+        return options
+
+    options.update(
+        poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def pool_statistics(engine) -> dict:
+    pool = engine.pool
+    statistics = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        statistics.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, _TimedCheckout):
+        with pool._stats_lock:
+            statistics.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_time_ms=pool.wait_time * 1000,
+                avg_wait_ms=pool.wait_time * 1000 / max(pool.checkouts, 1),
+                max_wait_ms=pool.max_wait * 1000,
+            )
+    return statistics
@@ -0,0 +1,313 @@
+"""Set-based statements behind the report endpoints.
+
+Every function here only builds a statement, so the same query runs on
+both the sync Session and the AsyncSession paths.
+"""
+
+import datetime
+from dataclasses import dataclass
+
+from sqlalchemy import Date, and_, case, cast, func, select, tuple_
+
+from backend.models import (
+    Credit,
+    MonthlyCollection,
+    MonthlyIssuance,
+    Payment,
+    Plan,
+    User,
+)
+
+ISSUANCE_CATEGORY = "видача"
+COLLECTION_CATEGORY = "збір"
+BODY_PAYMENT_TYPE = "тіло"
+PERCENT_PAYMENT_TYPE = "відсотки"
+
+
+def month_range(date: datetime.date) -> tuple[datetime.date, datetime.date]:
+    """Return the half-open [start, end) bounds of the month containing date."""
+    start = date.replace(day=1)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def _monthly_issuance(start, end):
+    return (
+        select(MonthlyIssuance.month, MonthlyIssuance.body_sum.label("amount"))
+        .where(MonthlyIssuance.month >= start, MonthlyIssuance.month < end)
+        .subquery()
+    )
+
+
+def _monthly_collections(start, end):
+    return (
+        select(
+            MonthlyCollection.month,
+            func.sum(MonthlyCollection.sum).label("amount"),
+        )
+        .where(MonthlyCollection.month >= start, MonthlyCollection.month < end)
+        .group_by(MonthlyCollection.month)
+        .subquery()
+    )
+
+
+def _year_to_date(month, amount, until):
+    """Sum a rollup from January of until's year through until's month."""
+    return (
+        select(func.coalesce(func.sum(amount), 0))
+        .where(month >= func.date_trunc("year", until), month <= until)
+        .scalar_subquery()
+    )
+
+
+def _performance(actual, planned):
+    return case((planned != 0, actual / planned * 100), else_=0)
+
+
+def plans_performance(
+    category_ids: dict[str, int],
+    from_date: datetime.date,
+    to_date: datetime.date,
+    cumulative: bool = False,
+):
+    """Select plan vs. actual for every plan between the months of from_date and
+    to_date (inclusive), one row per plan ordered by month.
+
+    With cumulative=True the rows also carry year-to-date running totals
+    per category; those are accumulated from January even when from_date
+    starts later in the year. The running plan sums the plan rows, the
+    running actual every month of the rollups, including months without
+    a plan of the category.
+
+    Actual amounts are read from the monthly rollup tables, so the cost
+    depends on the number of months rather than on credit and payment
+    volume.
+    """
+    start, _ = month_range(from_date)
+    _, end = month_range(to_date)
+    scan_start = start.replace(month=1) if cumulative else start
+
+    issued = _monthly_issuance(scan_start, end)
+    collected = _monthly_collections(scan_start, end)
+    plan_month = func.date_trunc("month", Plan.period)
+    actual_amount = case(
+        (
+            Plan.category_id == category_ids.get(ISSUANCE_CATEGORY),
+            func.coalesce(issued.c.amount, 0),
+        ),
+        (
+            Plan.category_id == category_ids.get(COLLECTION_CATEGORY),
+            func.coalesce(collected.c.amount, 0),
+        ),
+    )
+
+    columns = [
+        Plan.period,
+        Plan.category_id,
+        Plan.sum.label("plan_amount"),
+        actual_amount.label("actual_amount"),
+        _performance(actual_amount, Plan.sum).label("performance_percentage"),
+    ]
+    if cumulative:
+        window = {
+            "partition_by": (
+                Plan.category_id,
+                func.date_trunc("year", Plan.period),
+            ),
+            "order_by": (Plan.period, Plan.id),
+        }
+        cumulative_plan = func.sum(Plan.sum).over(**window)
+        cumulative_actual = case(
+            (
+                Plan.category_id == category_ids.get(ISSUANCE_CATEGORY),
+                _year_to_date(
+                    MonthlyIssuance.month, MonthlyIssuance.body_sum, plan_month
+                ),
+            ),
+            (
+                Plan.category_id == category_ids.get(COLLECTION_CATEGORY),
+                _year_to_date(
+                    MonthlyCollection.month, MonthlyCollection.sum, plan_month
+                ),
+            ),
+        )
+        columns += [
+            cumulative_plan.label("cumulative_plan_amount"),
+            cumulative_actual.label("cumulative_actual_amount"),
+            _performance(cumulative_actual, cumulative_plan).label(
+                "cumulative_performance_percentage"
+            ),
+        ]
+
+    report = (
+        select(*columns, Plan.id)
+        .outerjoin(issued, issued.c.month == plan_month)
+        .outerjoin(collected, collected.c.month == plan_month)
+        .where(Plan.period >= scan_start, Plan.period < end)
+        .subquery()
+    )
+    return (
+        select(*(c for c in report.c if c.key != "id"))
+        .where(report.c.period >= start)
+        .order_by(report.c.period, report.c.id)
+    )
+
+
+@dataclass(frozen=True)
+class CreditFilters:
+    returned: bool | None = None
+    overdue_only: bool = False
+    issued_from: datetime.date | None = None
+    issued_to: datetime.date | None = None
+
+    def clauses(self) -> list:
+        clauses = []
+        if self.returned is not None:
+            clauses.append(
+                Credit.actual_return_date.is_not(None)
+                if self.returned
+                else Credit.actual_return_date.is_(None)
+            )
+        if self.overdue_only:
+            clauses += [
+                Credit.actual_return_date.is_(None),
+                cast(Credit.return_date, Date) < func.current_date(),
+            ]
+        if self.issued_from is not None:
+            clauses.append(Credit.issuance_date >= self.issued_from)
+        if self.issued_to is not None:
+            clauses.append(
+                Credit.issuance_date
+                < self.issued_to + datetime.timedelta(days=1)
+            )
+        return clauses
+
+
+def user_credits(
+    user_ids: list[int],
+    filters: CreditFilters = CreditFilters(),
+    after: tuple[datetime.datetime, int] | None = None,
+    limit: int | None = None,
+):
+    """Select one row per credit of the given users, ordered by issuance
+    date and id.
+
+    Payment totals are read from the columns maintained on credits, so
+    this is an indexed lookup on (user_id, issuance_date, id). Users are
+    outer-joined and the filters go into the join condition, so that a
+    missing user_id in the result means the user does not exist, while a
+    single row with a NULL id means a user without matching credits.
+    after is the (issuance_date, id) keyset of the last credit already
+    returned.
+    """
+    overdue_days = func.greatest(
+        func.current_date() - cast(Credit.return_date, Date), 0
+    )
+    join_on = [
+        Credit.user_id == User.id,
+        # Postgres does not carry the IN list over the join by itself, and
+        # hash-joins a sequential scan of credits for batches without it
+        Credit.user_id.in_(user_ids),
+        *filters.clauses(),
+    ]
+    if after is not None:
+        join_on.append(tuple_(Credit.issuance_date, Credit.id) > after)
+
+    statement = (
+        select(
+            User.id.label("user_id"),
+            Credit.id,
+            Credit.issuance_date,
+            Credit.return_date,
+            Credit.actual_return_date,
+            Credit.body,
+            Credit.percent,
+            Credit.paid_body.label("body_payments"),
+            Credit.paid_percent.label("percent_payments"),
+            Credit.total_paid.label("total_payment"),
+            overdue_days.label("overdue_days"),
+        )
+        .select_from(User)
+        .outerjoin(Credit, and_(*join_on))
+        .where(User.id.in_(user_ids))
+        .order_by(User.id, Credit.issuance_date, Credit.id)
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+# (label, first, last overdue day) of the aging report buckets. Credits
+# not due yet count as 0 days overdue.
+AGING_BUCKETS = [
+    ("0", None, 0),
+    ("1-30", 1, 30),
+    ("31-90", 31, 90),
+    ("90+", 91, None),
+]
+
+
+def portfolio_aging():
+    """Count the active credits and sum what is left to pay on them per
+    overdue bucket, in one pass over ix_credits_active_return_date."""
+    # At most `last` days overdue means due on or after current_date - last;
+    # comparing return_date directly saves a date cast per credit.
+    active = (
+        select(
+            case(
+                *(
+                    (Credit.return_date >= func.current_date() - last, label)
+                    for label, _, last in AGING_BUCKETS[:-1]
+                ),
+                else_=AGING_BUCKETS[-1][0],
+            ).label("bucket"),
+            func.greatest(Credit.body - Credit.paid_body, 0).label("body"),
+            func.greatest(Credit.percent - Credit.paid_percent, 0).label(
+                "percent"
+            ),
+        )
+        .where(Credit.actual_return_date.is_(None))
+        .subquery()
+    )
+    return select(
+        active.c.bucket,
+        func.current_date().label("report_date"),
+        func.count().label("credits"),
+        func.sum(active.c.body).label("outstanding_body"),
+        func.sum(active.c.percent).label("outstanding_percent"),
+    ).group_by(active.c.bucket)
+
+
+def export_credits():
+    """Select every credit with its payment totals, ordered by id."""
+    return select(
+        Credit.id,
+        Credit.user_id,
+        Credit.issuance_date,
+        Credit.return_date,
+        Credit.actual_return_date,
+        Credit.body,
+        Credit.percent,
+        Credit.paid_body.label("body_payments"),
+        Credit.paid_percent.label("percent_payments"),
+        Credit.total_paid.label("total_payment"),
+        Credit.payments_count,
+        Credit.last_payment_date,
+    ).order_by(Credit.id)
+
+
+def credit_ids():
+    return select(Credit.id)
+
+
+def export_payments():
+    return select(
+        Payment.id,
+        Payment.credit_id,
+        Payment.payment_date,
+        Payment.type_id,
+        Payment.sum,
+    ).order_by(Payment.id)
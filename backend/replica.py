@@ -0,0 +1,118 @@
+"""Health and lag tracking of the optional read replica.
+
+Read-only endpoints use the replica while its replay lag stays within
+REPLICA_MAX_LAG seconds. The lag is measured at most every
+REPLICA_CHECK_INTERVAL seconds; a replica that lags behind or cannot be
+reached is skipped until a later check finds it healthy again, and reads
+go to the primary meanwhile. Read sessions connect to the replica before
+the request uses them, on pre-pinged connections, so a replica that goes
+down between checks is skipped as soon as a connection fails and that
+request reads from the primary; only a replica failing in the middle of
+a query still fails the request.
+
+Every commit on the primary also keeps reads on the primary for the next
+REPLICA_MAX_LAG seconds, so a client reads its own writes and the caches
+invalidated by a write are not refilled from a replica that has not
+replayed it yet. Writes made by other processes may still be missing
+from replica reads for up to REPLICA_MAX_LAG seconds.
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# Zero on a server that is not replaying WAL (e.g. a primary used as its
+# own replica) or that has replayed everything it received.
+# Tagged as infrastructure so per-request statement checks leave it out.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+).execution_options(infrastructure=True)
+
+
+class ReplicaStatus:
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag = None
+        self._usable = None
+        self._checked_at = None
+        self._written_at = None
+        self._lock = threading.Lock()
+
+    def wrote(self, *args):
+        """Engine "commit" event listener of the primary."""
+        with self._lock:
+            self._written_at = time.monotonic()
+
+    def _recently_written(self) -> bool:
+        with self._lock:
+            return (
+                self._written_at is not None
+                and time.monotonic() - self._written_at < self.max_lag
+            )
+
+    def _due(self) -> bool:
+        with self._lock:
+            return (
+                self._checked_at is None
+                or time.monotonic() - self._checked_at >= self.check_interval
+            )
+
+    def _record(self, lag: float | None) -> bool:
+        usable = lag is not None and lag <= self.max_lag
+        with self._lock:
+            if usable != self._usable:
+                logger.log(
+                    logging.INFO if usable else logging.WARNING,
+                    "Read replica %s (lag: %s)",
+                    "is in use" if usable else "is skipped",
+                    "unreachable" if lag is None else f"{lag:.1f}s",
+                )
+            self.lag = lag
+            self._usable = usable
+            self._checked_at = time.monotonic()
+        return usable
+
+    def unreachable(self):
+        """Skip the replica after a failed connection until the next
+        check."""
+        self._record(None)
+
+    def usable(self, engine) -> bool:
+        if engine is None or self._recently_written():
+            return False
+        if not self._due():
+            return bool(self._usable)
+        try:
+            with engine.connect() as connection:
+                lag = float(connection.scalar(LAG_QUERY) or 0)
+        except (DBAPIError, OSError):
+            lag = None
+        return self._record(lag)
+
+    async def ausable(self, engine) -> bool:
+        if engine is None or self._recently_written():
+            return False
+        if not self._due():
+            return bool(self._usable)
+        try:
+            async with engine.connect() as connection:
+                lag = float(await connection.scalar(LAG_QUERY) or 0)
+        except (DBAPIError, OSError):
+            lag = None
+        return self._record(lag)
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {
+                "in_use": bool(self._usable),
+                "lag_seconds": self.lag,
+                "max_lag_seconds": self.max_lag,
+            }
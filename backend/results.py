@@ -0,0 +1,181 @@
+"""Shape rows of the statements in backend.queries into response payloads.
+
+Shared by the sync and async routers, so both return identical bodies.
+"""
+
+import base64
+import datetime
+import io
+import itertools
+
+from fastapi import HTTPException, status
+
+from backend.config import USER_CREDIT_BATCH_SIZE
+from backend.queries import AGING_BUCKETS
+
+
+def credit_item(credit):
+    if not credit.actual_return_date:
+        return {
+            "issuance_date": credit.issuance_date,
+            "returned": False,
+            "return_date": credit.return_date,
+            "overdue_days": credit.overdue_days,
+            "body": credit.body,
+            "percent": credit.percent,
+            "body_payments": credit.body_payments,
+            "percent_payments": credit.percent_payments,
+        }
+    return {
+        "issuance_date": credit.issuance_date,
+        "returned": True,
+        "actual_return_date": credit.actual_return_date,
+        "body": credit.body,
+        "percent": credit.percent,
+        "total_payment": credit.total_payment,
+    }
+
+
+def encode_cursor(credit) -> str:
+    value = f"{credit.issuance_date.isoformat()}|{credit.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        issuance_date, id = value.decode().split("|")
+        return datetime.datetime.fromisoformat(issuance_date), int(id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def user_credit_page(rows, limit: int | None):
+    """Return the credit items of a page and the cursor of the next one.
+
+    rows must be fetched with limit + 1 so that a further page shows up
+    as one extra row.
+    """
+    credits = [credit for credit in rows if credit.id is not None]
+    next_cursor = None
+    if limit is not None and len(credits) > limit:
+        credits = credits[:limit]
+        next_cursor = encode_cursor(credits[-1])
+    return [credit_item(credit) for credit in credits], next_cursor
+
+
+class UserCreditsBatch:
+    """Collect per-user credits while user IDs are resolved chunk by chunk.
+
+    Every ID is reported, unknown ones with not_found set; repeated IDs
+    are looked up only once.
+    """
+
+    def __init__(self, chunk_size: int = USER_CREDIT_BATCH_SIZE):
+        self.chunk_size = chunk_size
+        self.results = {}
+
+    def chunks(self, user_ids):
+        ids = iter(user_ids)
+        while chunk := list(itertools.islice(ids, self.chunk_size)):
+            chunk = [
+                user_id for user_id in chunk if user_id not in self.results
+            ]
+            for user_id in chunk:
+                self.results[user_id] = {"not_found": True, "credits": []}
+            if chunk:
+                yield chunk
+
+    def add(self, rows):
+        for credit in rows:
+            result = self.results[credit.user_id]
+            result["not_found"] = False
+            if credit.id is not None:
+                result["credits"].append(credit_item(credit))
+
+
+def read_user_ids(file):
+    lines = io.TextIOWrapper(file.file, encoding="utf-8")
+    for line_number, line in enumerate(lines, start=1):
+        value = line.strip()
+        if not value:
+            continue
+        # isdigit() alone also accepts digits int() rejects, such as "²"
+        if not (value.isascii() and value.isdigit()):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Line {line_number}: {value!r} is not a user ID",
+            )
+        yield int(value)
+
+
+def plans_performance_results(rows, category_names: dict[int, str]):
+    results = []
+    for row in rows:
+        if row.actual_amount is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Total amount must be number",
+            )
+
+        result = {
+            "month": row.period.strftime("%Y-%m"),
+            "category": category_names.get(row.category_id),
+            "plan_amount": row.plan_amount,
+            "actual_amount": row.actual_amount,
+            "performance_percentage": round(row.performance_percentage, 2),
+        }
+        if "cumulative_plan_amount" in row._fields:
+            result.update(
+                {
+                    "cumulative_plan_amount": row.cumulative_plan_amount,
+                    "cumulative_actual_amount": row.cumulative_actual_amount,
+                    "cumulative_performance_percentage": round(
+                        row.cumulative_performance_percentage, 2
+                    ),
+                }
+            )
+        results.append(result)
+
+    return results
+
+
+def portfolio_aging_results(rows):
+    rows = rows.all()
+    totals = {
+        row.bucket: (
+            row.credits,
+            row.outstanding_body,
+            row.outstanding_percent,
+        )
+        for row in rows
+    }
+    buckets = []
+    for label, first, last in AGING_BUCKETS:
+        credits, body, percent = totals.get(label, (0, 0.0, 0.0))
+        buckets.append(
+            {
+                "bucket": label,
+                "min_overdue_days": first,
+                "max_overdue_days": last,
+                "credits": credits,
+                "outstanding_body": round(body, 2),
+                "outstanding_percent": round(percent, 2),
+            }
+        )
+    return {
+        # The database's date, which overdue days are counted to
+        "report_date": (
+            rows[0].report_date if rows else datetime.date.today()
+        ),
+        "buckets": buckets,
+        "credits": sum(bucket["credits"] for bucket in buckets),
+        "outstanding_body": round(
+            sum(bucket["outstanding_body"] for bucket in buckets), 2
+        ),
+        "outstanding_percent": round(
+            sum(bucket["outstanding_percent"] for bucket in buckets), 2
+        ),
+    }
@@ -0,0 +1,66 @@
+"""Monthly issuance and collection rollups.
+
+The rollup tables are kept up to date incrementally by the statement-level
+triggers installed in the "monthly rollups" migration. Run this module to
+rebuild them from scratch after a backfill or a bulk load that bypassed
+the triggers:
+
+    python -m backend.rollups
+
+A rebuild only counts the payments still attached to the payments table;
+the months of detached partitions (see backend.partitions) are lost.
+"""
+
+import logging
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal
+from backend.models import Credit, MonthlyCollection, MonthlyIssuance, Payment
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_rollups(db: Session):
+    # Block writers until commit so no trigger delta is lost or doubled.
+    db.execute(text("LOCK TABLE credits, payments IN SHARE MODE"))
+    db.execute(delete(MonthlyIssuance))
+    db.execute(delete(MonthlyCollection))
+
+    issuance_month = func.date_trunc("month", Credit.issuance_date)
+    db.execute(
+        insert(MonthlyIssuance).from_select(
+            ["month", "credits_count", "body_sum"],
+            select(
+                issuance_month, func.count(), func.sum(Credit.body)
+            ).group_by(issuance_month),
+        )
+    )
+    payment_month = func.date_trunc("month", Payment.payment_date)
+    db.execute(
+        insert(MonthlyCollection).from_select(
+            ["month", "type_id", "payments_count", "sum"],
+            select(
+                payment_month,
+                Payment.type_id,
+                func.count(),
+                func.sum(Payment.sum),
+            ).group_by(payment_month, Payment.type_id),
+        )
+    )
+    db.commit()
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s - %(message)s"
+    )
+    with SessionLocal() as db:
+        logger.info("Rebuilding monthly rollups...")
+        rebuild_rollups(db)
+        logger.info("Monthly rollups rebuilt")
+
+
+if __name__ == "__main__":
+    main()
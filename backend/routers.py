@@ -8,31 +8,94 @@ from fastapi import (
     File,
     HTTPException,
     Query,
+    Request,
+    Response,
     UploadFile,
     status,
 )
-from sqlalchemy import extract, text
-from sqlalchemy.orm import Session, joinedload
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
-from backend.database import get_db
-from backend.models import Credit, Dictionary, Payment, Plan, User
+from backend import exports, forecast, instrumentation, queries, results
+from backend.cache import plans_performance_cache
+from backend.config import (
+    FORECAST_MAX_MONTHS,
+    PAYMENTS_INSERT_CHUNK_SIZE,
+    USER_CREDIT_BATCH_SIZE,
+    USER_CREDIT_PAGE_LIMIT,
+)
+from backend.database import (
+    async_engine,
+    async_read_engine,
+    engine,
+    get_db,
+    get_read_db,
+    read_engine,
+    replica_status,
+)
+from backend.dictionaries import dictionaries
+from backend.imports import PaymentImport, PlanImport
+from backend.jobs import import_jobs
+from backend.partitions import payment_partitions
+from backend.pooling import pool_statistics
 from backend.schemas import (
+    ExportFormat,
+    ImportJobSchema,
+    ListCollectionsForecastSchema,
+    ListPlanPerformanceRangeSchema,
     ListPlanPerformanceSchema,
+    PaymentsInsertResponseSchema,
+    PlanImportMode,
     PlanResponseSchema,
+    PortfolioAgingSchema,
+    UserCreditBatchResponseSchema,
     UserCreditResponseSchema,
+    UserIdsSchema,
 )
 
 router = APIRouter()
 
 
+def credit_filters(
+    returned: bool | None = Query(
+        None, description="Only returned (true) or only active (false)"
+    ),
+    overdue_only: bool = Query(
+        False, description="Only active credits past their return date"
+    ),
+    issued_from: datetime.date | None = Query(
+        None, description="First issuance date in YYYY-MM-DD format"
+    ),
+    issued_to: datetime.date | None = Query(
+        None, description="Last issuance date in YYYY-MM-DD format"
+    ),
+) -> queries.CreditFilters:
+    return queries.CreditFilters(
+        returned=returned,
+        overdue_only=overdue_only,
+        issued_from=issued_from,
+        issued_to=issued_to,
+    )
+
+
 @router.get(
     "/user_credit/{user_id}",
     response_model=UserCreditResponseSchema,
     summary="Get user credits",
-    description="Method for retrieving information about a user's credits by their ID.",
+    description="Method for retrieving information about a user's credits by their ID.<br>"
+    "Credits are ordered by issuance date. With limit the response is a "
+    "page; when more credits follow, the X-Next-Cursor header holds the "
+    "cursor of the next page.",
     responses={
         200: {
             "description": "Information about user credits.",
+            "headers": {
+                "X-Next-Cursor": {
+                    "description": "Cursor of the next page, if any",
+                    "schema": {"type": "string"},
+                }
+            },
             "content": {
                 "application/json": {
                     "example": [
@@ -68,70 +131,137 @@ router = APIRouter()
         },
     },
 )
-def get_user_credit(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter_by(id=user_id).first()
-    if not user:
+def get_user_credit(
+    response: Response,
+    user_id: int,
+    filters: queries.CreditFilters = Depends(credit_filters),
+    limit: int | None = Query(
+        None, ge=1, le=USER_CREDIT_PAGE_LIMIT, description="Page size"
+    ),
+    cursor: str | None = Query(
+        None, description="X-Next-Cursor of the previous page"
+    ),
+    db: Session = Depends(get_read_db),
+):
+    after = results.decode_cursor(cursor) if cursor else None
+    rows = db.execute(
+        queries.user_credits(
+            [user_id], filters, after, limit + 1 if limit else None
+        )
+    ).all()
+    if not rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    user_credits = (
-        db.query(Credit)
-        .filter_by(user_id=user_id)
-        .options(joinedload(Credit.payments).joinedload(Payment.payment_type))
-        .all()
-    )
 
-    credit_list = []
-    for credit in user_credits:
+    credits, next_cursor = results.user_credit_page(rows, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return credits
 
-        if not credit.actual_return_date:
-            body_payments = sum(
-                payment.sum
-                for payment in credit.payments
-                if payment.payment_type.name == "тіло"
-            )
-            percent_payments = sum(
-                payment.sum
-                for payment in credit.payments
-                if payment.payment_type.name == "відсотки"
-            )
-            overdue_days = (
-                (datetime.date.today() - credit.return_date.date()).days
-                if datetime.date.today() > credit.return_date.date()
-                else 0
-            )
 
-            credit_list.append(
-                {
-                    "issuance_date": credit.issuance_date,
-                    "returned": False,
-                    "return_date": credit.return_date,
-                    "overdue_days": overdue_days,
-                    "body": credit.body,
-                    "percent": credit.percent,
-                    "body_payments": body_payments,
-                    "percent_payments": percent_payments,
+@router.post(
+    "/user_credit/batch",
+    response_model=UserCreditBatchResponseSchema,
+    summary="Get credits of many users",
+    description="Method for retrieving information about the credits "
+    "of many users at once. Users are resolved in chunks of "
+    f"{USER_CREDIT_BATCH_SIZE} with one query per chunk.",
+    responses={
+        200: {
+            "description": "Credits per user ID.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "1": {
+                            "not_found": False,
+                            "credits": [
+                                {
+                                    "issuance_date": "2023-01-01",
+                                    "returned": True,
+                                    "actual_return_date": "2023-06-01",
+                                    "body": 5000,
+                                    "percent": 150,
+                                    "total_payment": 5150,
+                                }
+                            ],
+                        },
+                        "99999": {"not_found": True, "credits": []},
+                    }
                 }
-            )
-        else:
-            total_payment = sum(payment.sum for payment in credit.payments)
-            credit_list.append(
-                {
-                    "issuance_date": credit.issuance_date,
-                    "returned": True,
-                    "actual_return_date": credit.actual_return_date,
-                    "body": credit.body,
-                    "percent": credit.percent,
-                    "total_payment": total_payment,
+            },
+        },
+        500: {
+            "description": "Internal Server Error",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "An error occurred while processing the request."
+                    }
                 }
-            )
+            },
+        },
+    },
+)
+def get_user_credit_batch(
+    user_ids: UserIdsSchema, db: Session = Depends(get_read_db)
+):
+    return _user_credits_batch(db, user_ids.user_ids)
+
+
+@router.post(
+    "/user_credit/batch_file",
+    response_model=UserCreditBatchResponseSchema,
+    summary="Get credits of many users from a file",
+    description="Upload a text file with one user ID per line. "
+    "The file is read as a stream and resolved in chunks of "
+    f"{USER_CREDIT_BATCH_SIZE} IDs.",
+    responses={
+        200: {
+            "description": "Credits per user ID.",
+            "content": {
+                "application/json": {
+                    "example": {"99999": {"not_found": True, "credits": []}}
+                }
+            },
+        },
+        400: {
+            "description": "A line of the file is not a user ID.",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Line 3: 'abc' is not a user ID"}
+                }
+            },
+        },
+        500: {
+            "description": "Internal Server Error",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "An error occurred while processing the file."
+                    }
+                }
+            },
+        },
+    },
+)
+def get_user_credit_batch_file(
+    file: UploadFile = File(...), db: Session = Depends(get_read_db)
+):
+    return _user_credits_batch(db, results.read_user_ids(file))
+
 
-    return credit_list
+def _user_credits_batch(db, user_ids):
+    batch = results.UserCreditsBatch()
+    for chunk in batch.chunks(user_ids):
+        batch.add(db.execute(queries.user_credits(chunk)))
+    return batch.results
 
 
 @router.post(
     "/plans_insert",
     response_model=PlanResponseSchema,
+    response_model_exclude_none=True,
     summary="Add plans from a CSV file",
     description="Upload file in CSV format with similar stucture:<br>"
     "01.07.2023\t214000\tвидача<br>"
@@ -139,10 +269,14 @@ def get_user_credit(user_id: int, db: Session = Depends(get_db)):
     "\nFile must include the following columns:\n"
     "1. Period (date in format DD.MM.YYYY)\n"
     "2. Summa (Number)\n"
-    "3. Category (String,Category name).",
+    "3. Category (String,Category name).\n\n"
+    "mode decides what happens to plans whose period and category are "
+    "already stored: insert rejects the file, upsert overwrites their sum "
+    "and skip keeps them. upsert and skip are safe to retry.",
     responses={
         200: {
-            "description": "Plans successfully added.",
+            "description": "Plans successfully added. upsert and skip also "
+            "report how many plans were inserted, updated or skipped.",
             "content": {
                 "application/json": {
                     "example": {"message": "Plans successfully added"}
@@ -150,11 +284,15 @@ def get_user_credit(user_id: int, db: Session = Depends(get_db)):
             },
         },
         400: {
-            "description": "Incorrect data in the file or a plan with such period and category already exists.",
+            "description": "Incorrect data in the file or, in insert mode, a plan with such period and category already exists. "
+            "Nothing is added; every invalid row is reported.",
             "content": {
                 "application/json": {
                     "example": {
-                        "detail": "Plan with period 01.07.2023 and category 'видача' already exists."
+                        "detail": [
+                            "Row 2: Sum must be number 12a",
+                            "Row 5: Plan with period 2023-07-01 and category видача already exists",
+                        ]
                     }
                 }
             },
@@ -171,66 +309,264 @@ def get_user_credit(user_id: int, db: Session = Depends(get_db)):
         },
     },
 )
-def plans_insert(file: UploadFile = File(...), db: Session = Depends(get_db)):
+def plans_insert(
+    file: UploadFile = File(...),
+    mode: PlanImportMode = Query(
+        "insert", description="insert, upsert or skip existing plans"
+    ),
+    db: Session = Depends(get_db),
+):
     reader = csv.reader(
         io.TextIOWrapper(file.file, encoding="utf-8"), delimiter="\t"
     )
-    categories = db.query(Dictionary).all()
-
-    # Update autoincrement for plans table
-    db.execute(
-        text(
-            "SELECT setval(pg_get_serial_sequence('plans', 'id'), (SELECT MAX(id) FROM plans), true);"
+    plan_import = PlanImport(dictionaries.get(db).ids)
+    plan_import.parse(reader)
+    if mode == "insert" and plan_import.plans:
+        plan_import.check_existing(db.execute(plan_import.existing_plans()))
+    if plan_import.errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=plan_import.errors,
         )
-    )
+
+    inserted = []
+    if plan_import.plans:
+        try:
+            inserted = db.scalars(plan_import.insert_plans(mode)).all()
+        except IntegrityError:
+            # Another upload stored some of the plans after the check
+            db.rollback()
+            plan_import.check_existing(
+                db.execute(plan_import.existing_plans())
+            )
+            if not plan_import.errors:
+                raise
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=plan_import.errors,
+            )
     db.commit()
+    plans_performance_cache.invalidate(
+        plan["period"] for plan in plan_import.plans
+    )
+
+    return plan_import.result(mode, inserted)
+
 
-    try:
-        for row in reader:
-            period = datetime.datetime.strptime(row[0], "%d.%m.%Y").date()
-            category_name = row[2]
-            sum = row[1]
-
-            if period.day != 1:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Period {period} must be the first day of the month",
-                )
-
-            if not sum.isdigit():
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Sum must be number {sum}",
-                )
-
-            if (
-                db.query(Plan)
-                .join(Dictionary)
-                .filter(
-                    Plan.period == period, Dictionary.name == category_name
-                )
-                .first()
-            ):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Plan with period {period} and category {category_name} already exists",
-                )
-            else:
-                category = [
-                    category
-                    for category in categories
-                    if category.name == category_name
-                ][0]
-                plan = Plan(period=period, sum=sum, category_id=category.id)
-                db.add(plan)
-    except ValueError as e:
+@router.post(
+    "/payments_insert",
+    response_model=PaymentsInsertResponseSchema,
+    summary="Add payments from a CSV file",
+    description="Upload file in CSV format with similar stucture:<br>"
+    "2\t14.01.2020\t2\t1837.50<br>"
+    "3\t23.01.2020\t1\t136.36<br>"
+    "\nFile must include the following columns:\n"
+    "1. Credit ID (Integer)\n"
+    "2. Payment date (date in format DD.MM.YYYY)\n"
+    "3. Payment type ID (Integer)\n"
+    "4. Sum (Number).\n\n"
+    "The file is processed as a stream and committed in chunks. If a chunk "
+    "contains invalid rows the import stops before it; send the same file "
+    "again with the returned offset to continue after fixing them.",
+    responses={
+        200: {
+            "description": "Payments successfully added.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "message": "Payments successfully added",
+                        "inserted": 25000,
+                        "offset": 25000,
+                    }
+                }
+            },
+        },
+        400: {
+            "description": "Incorrect data in the file. Chunks before the "
+            "invalid rows are committed; offset is the number of file rows "
+            "already processed.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": {
+                            "inserted": 10000,
+                            "offset": 10000,
+                            "errors": [
+                                "Row 10002: Unknown credit 999999",
+                                "Row 10007: Sum must be number 12a",
+                            ],
+                        }
+                    }
+                }
+            },
+        },
+    },
+)
+def payments_insert(
+    file: UploadFile = File(...),
+    offset: int = Query(
+        0,
+        ge=0,
+        description="File rows to skip, as returned by a failed upload",
+    ),
+    db: Session = Depends(get_db),
+):
+    reader = csv.reader(
+        io.TextIOWrapper(file.file, encoding="utf-8"), delimiter="\t"
+    )
+    payment_import = PaymentImport(
+        set(db.scalars(queries.credit_ids())),
+        set(dictionaries.get(db).names),
+        PAYMENTS_INSERT_CHUNK_SIZE,
+    )
+    for chunk in payment_import.chunks(reader, offset):
+        payment_partitions.ensure(payment["payment_date"] for payment in chunk)
+        db.execute(payment_import.insert_chunk(chunk))
+        db.commit()
+        plans_performance_cache.invalidate(
+            payment["payment_date"] for payment in chunk
+        )
+    if payment_import.errors:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Please input the correct document structure",
+            detail={
+                "inserted": payment_import.inserted,
+                "offset": payment_import.offset,
+                "errors": payment_import.errors,
+            },
         )
-    db.commit()
 
-    return {"message": "Plans successfully added"}
+    return {
+        "message": "Payments successfully added",
+        "inserted": payment_import.inserted,
+        "offset": payment_import.offset,
+    }
+
+
+JOB_RESPONSES = {
+    202: {
+        "description": "The file is spooled and its import queued. Poll "
+        "/import_jobs/{job_id} for progress and the result.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "id": "5f0c4b0e9d7a4c1f9b1f3c2a6e8d7b10",
+                    "kind": "plans",
+                    "status": "queued",
+                    "rows_parsed": 0,
+                    "rows_validated": 0,
+                    "rows_inserted": 0,
+                    "errors": [],
+                    "created_at": "2024-01-05T10:00:00Z",
+                }
+            }
+        },
+    },
+    503: {
+        "description": "Too many imports are queued or running.",
+        "content": {
+            "application/json": {
+                "example": {"detail": "Import queue is full, retry later"}
+            }
+        },
+    },
+}
+
+
+def _submit_import_job(kind, file, **options):
+    job = import_jobs.submit(kind, file.file, **options)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Import queue is full, retry later",
+        )
+    return job.snapshot()
+
+
+@router.post(
+    "/plans_insert/jobs",
+    response_model=ImportJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Add plans from a CSV file in the background",
+    description="Same file and modes as /plans_insert, imported by a "
+    "background worker. Returns a job at once; its errors and result "
+    "match the 400 detail and the 200 response of /plans_insert.",
+    responses=JOB_RESPONSES,
+)
+def plans_insert_job(
+    file: UploadFile = File(...),
+    mode: PlanImportMode = Query(
+        "insert", description="insert, upsert or skip existing plans"
+    ),
+):
+    return _submit_import_job("plans", file, mode=mode)
+
+
+@router.post(
+    "/payments_insert/jobs",
+    response_model=ImportJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Add payments from a CSV file in the background",
+    description="Same file and offset as /payments_insert, imported by a "
+    "background worker. Returns a job at once; the result of a finished "
+    "job holds inserted and the offset to resume a failed import from.",
+    responses=JOB_RESPONSES,
+)
+def payments_insert_job(
+    file: UploadFile = File(...),
+    offset: int = Query(
+        0,
+        ge=0,
+        description="File rows to skip, as returned by a failed upload",
+    ),
+):
+    return _submit_import_job("payments", file, offset=offset)
+
+
+@router.get(
+    "/import_jobs/{job_id}",
+    response_model=ImportJobSchema,
+    response_model_exclude_none=True,
+    summary="Get the status of an import job",
+    description="Progress counters, row-level errors and, once finished, "
+    "the result of a background import. Jobs are kept in memory by the "
+    "app process that accepted them.",
+    responses={
+        200: {
+            "description": "Job status.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "id": "5f0c4b0e9d7a4c1f9b1f3c2a6e8d7b10",
+                        "kind": "payments",
+                        "status": "failed",
+                        "rows_parsed": 20000,
+                        "rows_validated": 10000,
+                        "rows_inserted": 10000,
+                        "errors": ["Row 10002: Unknown credit 999999"],
+                        "result": {"inserted": 10000, "offset": 10000},
+                        "created_at": "2024-01-05T10:00:00Z",
+                        "started_at": "2024-01-05T10:00:01Z",
+                        "finished_at": "2024-01-05T10:00:03Z",
+                    }
+                }
+            },
+        },
+        404: {
+            "description": "Unknown or expired job.",
+            "content": {
+                "application/json": {"example": {"detail": "Job not found"}}
+            },
+        },
+    },
+)
+def get_import_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return job.snapshot()
 
 
 @router.get(
@@ -241,7 +577,9 @@ def plans_insert(file: UploadFile = File(...), db: Session = Depends(get_db)):
     "the implementation of plans for a specific date.",
     responses={
         200: {
-            "description": "List of execution plans for a given date.",
+            "description": "List of execution plans for a given date. "
+            "Carries an ETag; send it back in If-None-Match to get 304 "
+            "while the month has not changed.",
             "content": {
                 "application/json": {
                     "example": [
@@ -263,6 +601,7 @@ def plans_insert(file: UploadFile = File(...), db: Session = Depends(get_db)):
                 }
             },
         },
+        304: {"description": "The month has not changed since the ETag."},
         400: {
             "description": "The date was incorrectly transmitted or there are no plans for this date.",
             "content": {
@@ -286,68 +625,376 @@ def plans_insert(file: UploadFile = File(...), db: Session = Depends(get_db)):
     },
 )
 def get_plans_performance(
+    request: Request,
+    response: Response,
     check_date: datetime.date = Query(
         description="Date for checking plan execution in YYYY-MM-DD format",
     ),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    results = []
-    plans = (
-        db.query(Plan)
-        .join(Dictionary, Plan.category_id == Dictionary.id)
-        .options(joinedload(Plan.category))
-        .filter(
-            extract("month", Plan.period) == check_date.month,
-            extract("year", Plan.period) == check_date.year,
+    month, _ = queries.month_range(check_date)
+    entry = plans_performance_cache.get(month)
+    if entry is None:
+        categories = dictionaries.get(db)
+        entry = plans_performance_cache.put(
+            month,
+            results.plans_performance_results(
+                db.execute(
+                    queries.plans_performance(categories.ids, month, month)
+                ),
+                categories.names,
+            ),
         )
-        .all()
-    )
 
-    for plan in plans:
-        try:
-            total_amount = None
-            if plan.category.name == "видача":
-                total_amount = sum(
-                    c.body
-                    for c in db.query(Credit)
-                    .filter(
-                        extract("month", Credit.issuance_date)
-                        == check_date.month,
-                        extract("year", Credit.issuance_date)
-                        == check_date.year,
-                        extract("day", Credit.issuance_date) >= 1,
-                    )
-                    .all()
-                )
-
-            elif plan.category.name == "збір":
-                total_amount = sum(
-                    p.sum
-                    for p in db.query(Payment)
-                    .filter(
-                        extract("month", Payment.payment_date)
-                        == check_date.month,
-                        extract("year", Payment.payment_date)
-                        == check_date.year,
-                        extract("day", Payment.payment_date) >= 1,
-                    )
-                    .all()
-                )
-            performance = (total_amount / plan.sum) * 100 if plan.sum else 0
-        except TypeError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Total amount must be number",
-            )
+    return entry.respond(request, response)
 
-        results.append(
-            {
-                "month": plan.period.strftime("%Y-%m"),
-                "category": plan.category.name,
-                "plan_amount": plan.sum,
-                "actual_amount": total_amount,
-                "performance_percentage": round(performance, 2),
-            }
+
+@router.get(
+    "/plans_performance_range",
+    response_model=ListPlanPerformanceRangeSchema,
+    response_model_exclude_none=True,
+    summary="Get plans performance for a range of months",
+    description="A method for obtaining information about "
+    "the implementation of plans for every month between two dates "
+    "(inclusive), optionally with year-to-date cumulative totals.",
+    responses={
+        200: {
+            "description": "List of execution plans per month and category.",
+            "content": {
+                "application/json": {
+                    "example": [
+                        {
+                            "month": "2023-01",
+                            "category": "видача",
+                            "plan_amount": 100000,
+                            "actual_amount": 80000,
+                            "performance_percentage": 80.0,
+                            "cumulative_plan_amount": 100000,
+                            "cumulative_actual_amount": 80000,
+                            "cumulative_performance_percentage": 80.0,
+                        },
+                        {
+                            "month": "2023-02",
+                            "category": "видача",
+                            "plan_amount": 100000,
+                            "actual_amount": 120000,
+                            "performance_percentage": 120.0,
+                            "cumulative_plan_amount": 200000,
+                            "cumulative_actual_amount": 200000,
+                            "cumulative_performance_percentage": 100.0,
+                        },
+                    ]
+                }
+            },
+        },
+        400: {
+            "description": "The range is empty or its bounds are reversed.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Start month must not be after end month"
+                    }
+                }
+            },
+        },
+        500: {
+            "description": "Internal Server Error",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "An error occurred while processing the request."
+                    }
+                }
+            },
+        },
+    },
+)
+def get_plans_performance_range(
+    from_date: datetime.date = Query(
+        alias="from",
+        description="Any date of the first month in YYYY-MM-DD format",
+    ),
+    to_date: datetime.date = Query(
+        alias="to",
+        description="Any date of the last month in YYYY-MM-DD format",
+    ),
+    cumulative: bool = Query(
+        False, description="Add year-to-date cumulative columns"
+    ),
+    db: Session = Depends(get_read_db),
+):
+    if from_date.replace(day=1) > to_date.replace(day=1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Start month must not be after end month",
         )
 
-    return results
+    categories = dictionaries.get(db)
+    return results.plans_performance_results(
+        db.execute(
+            queries.plans_performance(
+                categories.ids, from_date, to_date, cumulative
+            )
+        ),
+        categories.names,
+    )
+
+
+@router.get(
+    "/portfolio_aging",
+    response_model=PortfolioAgingSchema,
+    summary="Get the overdue aging of active credits",
+    description="Active (not returned) credits grouped by days overdue: "
+    "0 (not due yet or due today), 1-30, 31-90 and 90+. Every bucket "
+    "reports the number of credits and the body and percent still to be "
+    "paid on them.",
+    responses={
+        200: {
+            "description": "Aging buckets and portfolio totals.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "report_date": "2024-01-05",
+                        "buckets": [
+                            {
+                                "bucket": "0",
+                                "min_overdue_days": None,
+                                "max_overdue_days": 0,
+                                "credits": 120,
+                                "outstanding_body": 480000.0,
+                                "outstanding_percent": 96000.0,
+                            },
+                            {
+                                "bucket": "1-30",
+                                "min_overdue_days": 1,
+                                "max_overdue_days": 30,
+                                "credits": 15,
+                                "outstanding_body": 52000.0,
+                                "outstanding_percent": 12500.5,
+                            },
+                        ],
+                        "credits": 135,
+                        "outstanding_body": 532000.0,
+                        "outstanding_percent": 108500.5,
+                    }
+                }
+            },
+        },
+    },
+)
+def get_portfolio_aging(db: Session = Depends(get_read_db)):
+    return results.portfolio_aging_results(
+        db.execute(queries.portfolio_aging())
+    )
+
+
+@router.get(
+    "/collections_forecast",
+    response_model=ListCollectionsForecastSchema,
+    summary="Forecast collections against the plans",
+    description='Project the collections ("збір") of the coming months '
+    "from what is outstanding on open credits and the repayment curves of "
+    "recent vintages. Only payments made before the month of as_of are "
+    "used, so a past as_of backtests the forecast. Every month is set "
+    "against its collection plan, if there is one.",
+    responses={
+        200: {
+            "description": "One row per forecast month.",
+            "content": {
+                "application/json": {
+                    "example": [
+                        {
+                            "month": "2021-01",
+                            "category": "збір",
+                            "plan_amount": 1250000.0,
+                            "forecast_amount": 1187400.25,
+                            "forecast_body": 842100.5,
+                            "forecast_percent": 345299.75,
+                            "forecast_percentage": 94.99,
+                        }
+                    ]
+                }
+            },
+        },
+    },
+)
+def get_collections_forecast(
+    as_of: datetime.date | None = Query(
+        None,
+        description="Any date of the first forecast month in YYYY-MM-DD "
+        "format, the current month if omitted",
+    ),
+    months: int = Query(
+        6,
+        ge=1,
+        le=FORECAST_MAX_MONTHS,
+        description="Number of months to forecast",
+    ),
+    db: Session = Depends(get_read_db),
+):
+    return forecast.collections_forecast(
+        db,
+        dictionaries.get(db).ids,
+        as_of or datetime.date.today(),
+        months,
+    )
+
+
+@router.get(
+    "/export/credits",
+    summary="Export credits",
+    description="Stream every credit with its payment aggregates "
+    "(body, percent and total payments, payments count and last payment "
+    "date) as NDJSON or CSV. Rows are read from a server-side cursor, so "
+    "the export starts immediately and memory use does not depend on "
+    "portfolio size.",
+    responses={
+        200: {
+            "description": "One credit per line.",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id": 1, "user_id": 31, '
+                    '"issuance_date": "2020-01-11T00:00:00", '
+                    '"return_date": "2020-01-25T00:00:00", '
+                    '"actual_return_date": "2021-04-23T00:00:00", '
+                    '"body": 4500.0, "percent": 32535.0, '
+                    '"body_payments": 4500.0, "percent_payments": 32535.04, '
+                    '"total_payment": 37035.04, "payments_count": 12, '
+                    '"last_payment_date": "2021-04-23T00:00:00"}'
+                },
+                "text/csv": {},
+            },
+        },
+    },
+)
+def export_credits(
+    export_format: ExportFormat = Query(
+        "ndjson", alias="format", description="ndjson or csv"
+    ),
+):
+    return _export_response(queries.export_credits(), export_format, "credits")
+
+
+@router.get(
+    "/export/payments",
+    summary="Export payments",
+    description="Stream every payment as NDJSON or CSV straight from a "
+    "server-side cursor.",
+    responses={
+        200: {
+            "description": "One payment per line.",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id": 1, "credit_id": 2, '
+                    '"payment_date": "2020-01-14T00:00:00", "type_id": 2, '
+                    '"sum": 1837.5}'
+                },
+                "text/csv": {},
+            },
+        },
+    },
+)
+def export_payments(
+    export_format: ExportFormat = Query(
+        "ndjson", alias="format", description="ndjson or csv"
+    ),
+):
+    return _export_response(
+        queries.export_payments(), export_format, "payments"
+    )
+
+
+def _export_response(statement, export_format, name):
+    return StreamingResponse(
+        exports.stream_rows(statement, export_format),
+        media_type=exports.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{export_format}"'
+        },
+    )
+
+
+@router.get(
+    "/metrics",
+    summary="Get SQL metrics",
+    description="Per-endpoint totals of SQL statements, rows and database "
+    "time collected since the process started.",
+    responses={
+        200: {
+            "description": "Metrics keyed by method and route path.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "GET /plans_performance": {
+                            "requests": 10,
+                            "statements": 12,
+                            "rows": 40,
+                            "db_time_ms": 35.2,
+                            "total_time_ms": 61.7,
+                            "max_statements": 2,
+                            "slowest_statement_ms": 9.8,
+                            "slowest_statement": "SELECT ...",
+                            "avg_statements": 1.2,
+                            "avg_db_time_ms": 3.52,
+                            "avg_total_time_ms": 6.17,
+                        }
+                    }
+                }
+            },
+        },
+    },
+)
+def get_metrics():
+    return instrumentation.endpoint_metrics.snapshot()
+
+
+@router.get(
+    "/metrics/pool",
+    summary="Get connection pool statistics",
+    description="Live checked-out and overflow counts of the sync and async "
+    "engines' pools and the time spent waiting for a connection. With a "
+    "read replica configured, also its pool and replay lag.",
+    responses={
+        200: {
+            "description": "Statistics per engine.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "sync": {
+                            "pool": "TimedQueuePool",
+                            "size": 5,
+                            "checked_in": 3,
+                            "checked_out": 2,
+                            "overflow": 0,
+                            "max_overflow": 10,
+                            "checkouts": 120,
+                            "timeouts": 0,
+                            "wait_time_ms": 14.2,
+                            "avg_wait_ms": 0.12,
+                            "max_wait_ms": 3.1,
+                        },
+                        "async": {"pool": "TimedAsyncAdaptedQueuePool"},
+                        "replica": {
+                            "in_use": True,
+                            "lag_seconds": 0.4,
+                            "max_lag_seconds": 5.0,
+                            "sync": {"pool": "TimedQueuePool"},
+                        },
+                    }
+                }
+            },
+        },
+    },
+)
+def get_pool_metrics():
+    statistics = {
+        "sync": pool_statistics(engine),
+        "async": pool_statistics(async_engine),
+    }
+    if read_engine is not None:
+        statistics["replica"] = {
+            **replica_status.statistics(),
+            "sync": pool_statistics(read_engine),
+            "async": pool_statistics(async_read_engine),
+        }
+    return statistics
@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Union
+from datetime import date, datetime
+from typing import Literal, Union
 
 import sqlalchemy
 from pydantic import BaseModel
@@ -27,8 +27,49 @@ class ClosedCreditSchema(UserCreditBaseSchema):
 UserCreditResponseSchema = list[Union[ActiveCreditSchema, ClosedCreditSchema]]
 
 
+class UserIdsSchema(BaseModel):
+    user_ids: list[int]
+
+
+class UserCreditBatchItemSchema(BaseModel):
+    not_found: bool
+    credits: UserCreditResponseSchema
+
+
+UserCreditBatchResponseSchema = dict[int, UserCreditBatchItemSchema]
+
+
 class PlanResponseSchema(BaseModel):
     message: str
+    inserted: int | None = None
+    updated: int | None = None
+    skipped: int | None = None
+
+
+PlanImportMode = Literal["insert", "upsert", "skip"]
+
+
+class PaymentsInsertResponseSchema(BaseModel):
+    message: str
+    inserted: int
+    offset: int
+
+
+ImportJobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class ImportJobSchema(BaseModel):
+    id: str
+    kind: Literal["plans", "payments"]
+    status: ImportJobStatus
+    rows_parsed: int
+    rows_validated: int
+    rows_inserted: int
+    errors: list[str]
+    result: dict | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
 
 
 class PlanPerformanceSchema(BaseModel):
@@ -40,3 +81,45 @@ class PlanPerformanceSchema(BaseModel):
 
 
 ListPlanPerformanceSchema = list[PlanPerformanceSchema]
+
+
+class PlanPerformanceRangeSchema(PlanPerformanceSchema):
+    cumulative_plan_amount: float | None = None
+    cumulative_actual_amount: float | None = None
+    cumulative_performance_percentage: float | None = None
+
+
+ListPlanPerformanceRangeSchema = list[PlanPerformanceRangeSchema]
+
+
+class CollectionsForecastSchema(BaseModel):
+    month: str
+    category: str
+    plan_amount: float | None
+    forecast_amount: float
+    forecast_body: float
+    forecast_percent: float
+    forecast_percentage: float | None
+
+
+ListCollectionsForecastSchema = list[CollectionsForecastSchema]
+
+
+ExportFormat = Literal["ndjson", "csv"]
+
+
+class AgingBucketSchema(BaseModel):
+    bucket: str
+    min_overdue_days: int | None
+    max_overdue_days: int | None
+    credits: int
+    outstanding_body: float
+    outstanding_percent: float
+
+
+class PortfolioAgingSchema(BaseModel):
+    report_date: date
+    buckets: list[AgingBucketSchema]
+    credits: int
+    outstanding_body: float
+    outstanding_percent: float
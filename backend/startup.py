@@ -0,0 +1,68 @@
+"""Warm-up done by the app's lifespan before it serves requests.
+
+Startup loads the dictionaries cache, creates the payments partitions of
+the coming months, probes the read replica and opens a pool's worth of
+connections, so the first requests after a deploy do not pay for them.
+Each phase is timed and the timings are logged in one line.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    def __init__(self):
+        self.phases = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def report(self):
+        total = time.perf_counter() - self._started
+        logger.info(
+            f"Startup finished in {total * 1000:.0f}ms ("
+            + ", ".join(
+                f"{name} {elapsed * 1000:.0f}ms"
+                for name, elapsed in self.phases.items()
+            )
+            + ")"
+        )
+
+
+def _pool_size(engine) -> int:
+    # Without a pool of its own (DB_EXTERNAL_POOLER) there is nothing to keep
+    pool = engine.pool
+    return pool.size() if isinstance(pool, QueuePool) else 0
+
+
+def warm_pool(engine):
+    """Open pool_size connections at once and return them to the pool."""
+    connections = []
+    try:
+        for _ in range(_pool_size(engine)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def awarm_pool(engine):
+    connections = await asyncio.gather(
+        *(
+            engine.connect().start()
+            for _ in range(_pool_size(engine.sync_engine))
+        )
+    )
+    await asyncio.gather(*(connection.close() for connection in connections))
@@ -0,0 +1,14 @@
+"""Reproducible benchmarks of the API on synthetic data.
+
+    python -m benchmarks generate /tmp/bench --payments 1000000 --seed 1
+    POSTGRES_DB=bench python -m benchmarks load /tmp/bench --truncate
+    POSTGRES_DB=bench python -m benchmarks run --output results.json
+    POSTGRES_DB=bench python -m benchmarks check-plans
+
+generate writes users, credits, payments and plans in the test_csv_set
+format, load bulk-loads them with upload_test_files, and run measures the
+endpoints and prints (or writes) the results as JSON, so runs against the
+same seed and scale can be compared over time. check-plans explains the
+queries of the endpoints and fails on sequential scans of large tables,
+extra statements per request and buffer-hungry plans.
+"""
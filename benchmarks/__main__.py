@@ -0,0 +1,152 @@
+import argparse
+import datetime
+import json
+import logging
+import sys
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO, format="%(levelname)s - %(message)s"
+    )
+    # One line per request otherwise
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Generate synthetic data, load it and benchmark the API.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser(
+        "generate", help="Write seeded synthetic files in test_csv_set format"
+    )
+    generate.add_argument("directory", help="Output directory")
+    generate.add_argument(
+        "--payments", type=int, default=100_000, help="Payments to generate"
+    )
+    generate.add_argument(
+        "--credits", type=int, help="Credits, a tenth of payments by default"
+    )
+    generate.add_argument(
+        "--users", type=int, help="Users, as many as credits by default"
+    )
+    generate.add_argument(
+        "--months", type=int, default=48, help="Months credits spread over"
+    )
+    generate.add_argument(
+        "--start",
+        type=datetime.date.fromisoformat,
+        default=datetime.date(2020, 1, 1),
+        help="First month, YYYY-MM-DD",
+    )
+    generate.add_argument("--seed", type=int, default=1)
+
+    load = commands.add_parser(
+        "load", help="Migrate the database and bulk-load generated files"
+    )
+    load.add_argument("directory", help="Directory written by generate")
+    load.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Empty every table of the database before loading",
+    )
+
+    run = commands.add_parser("run", help="Run the endpoint scenarios")
+    run.add_argument(
+        "--url", help="Base URL of a running app; in-process if omitted"
+    )
+    run.add_argument(
+        "--requests", type=int, default=200, help="Requests per scenario"
+    )
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument(
+        "--warmup", type=int, default=10, help="Unmeasured requests first"
+    )
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument(
+        "--scenario",
+        action="append",
+        dest="scenarios",
+        help="Run only this scenario; repeat for several",
+    )
+    run.add_argument("--output", help="Write the JSON results to this file")
+
+    check = commands.add_parser(
+        "check-plans",
+        help="EXPLAIN the endpoint queries and check their plans, "
+        "exit with 1 on a failed check",
+    )
+    check.add_argument(
+        "--seq-scan-rows",
+        type=int,
+        default=10_000,
+        help="Most payments or credits rows a sequential scan may read",
+    )
+    check.add_argument(
+        "--buffer-budget",
+        type=int,
+        default=10_000,
+        help="Most shared buffers a statement may touch",
+    )
+    check.add_argument("--seed", type=int, default=1)
+    check.add_argument(
+        "--scenario",
+        action="append",
+        dest="scenarios",
+        help="Check only this scenario; repeat for several",
+    )
+    check.add_argument("--output", help="Write the plans as JSON to this file")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        from benchmarks.generate import generate
+
+        generate(
+            args.directory,
+            args.payments,
+            args.credits,
+            args.users,
+            args.months,
+            args.start,
+            args.seed,
+        )
+    elif args.command == "load":
+        from benchmarks.load import load
+
+        load(args.directory, args.truncate)
+    elif args.command == "check-plans":
+        from benchmarks.plan_checks import run_checks
+
+        results = run_checks(
+            args.seq_scan_rows, args.buffer_budget, args.seed, args.scenarios
+        )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(
+                    {result.name: result.as_dict() for result in results},
+                    file,
+                    indent=2,
+                )
+        if any(result.failures for result in results):
+            sys.exit(1)
+    else:
+        from benchmarks.scenarios import run
+
+        results = run(
+            args.url,
+            args.requests,
+            args.concurrency,
+            args.warmup,
+            args.seed,
+            args.scenarios,
+        )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Seeded synthetic data in the test_csv_set format.
+
+The same seed and scale always produce the same files. Rows are written
+as they are generated, so memory stays flat up to 10^8 payments. Credits
+are spread over --months months from --start; every credit gets an equal
+share of the payments, dated between its issuance and its actual (or,
+for credits still open, the last generated) return date.
+"""
+
+import csv
+import datetime
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY = [(1, "тіло"), (2, "відсотки"), (3, "видача"), (4, "збір")]
+ISSUANCE_CATEGORY = 3
+COLLECTION_CATEGORY = 4
+
+HEADERS = {
+    "users.csv": ["id", "login", "registration_date"],
+    "dictionary.csv": ["id", "name"],
+    "credits.csv": [
+        "id",
+        "user_id",
+        "issuance_date",
+        "return_date",
+        "actual_return_date",
+        "body",
+        "percent",
+    ],
+    "payments.csv": ["id", "credit_id", "payment_date", "type_id", "sum"],
+    "plans.csv": ["id", "period", "sum", "category_id"],
+}
+
+
+def _date(value: datetime.date) -> str:
+    return f"{value:%d.%m.%Y}"
+
+
+def _month(start: datetime.date, months: int) -> datetime.date:
+    index = start.month - 1 + months
+    return datetime.date(start.year + index // 12, index % 12 + 1, 1)
+
+
+def generate(
+    directory: str,
+    payments: int,
+    credits: int | None = None,
+    users: int | None = None,
+    months: int = 48,
+    start: datetime.date = datetime.date(2020, 1, 1),
+    seed: int = 1,
+) -> dict[str, int]:
+    """Write the five files into directory and return their row counts."""
+    credits = credits or max(payments // 10, 1)
+    users = users or credits
+    rng = random.Random(seed)
+    start = start.replace(day=1)
+    end = _month(start, months)
+    days = (end - start).days
+    started = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+
+    with ExitStack() as stack:
+        writers = {}
+        for name, header in HEADERS.items():
+            file = stack.enter_context(
+                open(
+                    os.path.join(directory, name),
+                    "w",
+                    encoding="utf-8",
+                    newline="",
+                )
+            )
+            writers[name] = csv.writer(file, delimiter="\t")
+            writers[name].writerow(header)
+
+        writers["dictionary.csv"].writerows(DICTIONARY)
+        for user_id in range(1, users + 1):
+            writers["users.csv"].writerow(
+                [
+                    user_id,
+                    f"user{user_id}",
+                    _date(start + datetime.timedelta(rng.randrange(days))),
+                ]
+            )
+
+        payment_id = 0
+        issued = [0.0] * months
+        collected = [0.0] * months
+        for credit_id in range(1, credits + 1):
+            issuance_date = start + datetime.timedelta(rng.randrange(days))
+            return_date = issuance_date + datetime.timedelta(
+                rng.choice((14, 30, 90, 180, 365))
+            )
+            actual_return_date = None
+            if rng.random() < 0.7:
+                actual_return_date = return_date + datetime.timedelta(
+                    rng.randint(-10, 120)
+                )
+                actual_return_date = min(
+                    max(actual_return_date, issuance_date), end
+                )
+            body = rng.randrange(1000, 50001, 500)
+            percent = round(body * rng.uniform(0.1, 1.5), 2)
+            writers["credits.csv"].writerow(
+                [
+                    credit_id,
+                    rng.randint(1, users),
+                    _date(issuance_date),
+                    _date(return_date),
+                    _date(actual_return_date) if actual_return_date else "",
+                    body,
+                    percent,
+                ]
+            )
+            month_index = (issuance_date.year - start.year) * 12 + (
+                issuance_date.month - start.month
+            )
+            issued[month_index] += body
+
+            last_day = (actual_return_date or end - datetime.timedelta(1)) - (
+                issuance_date
+            )
+            count = payments * credit_id // credits - (
+                payments * (credit_id - 1) // credits
+            )
+            for _ in range(count):
+                payment_id += 1
+                payment_date = issuance_date + datetime.timedelta(
+                    rng.randint(0, max(last_day.days, 0))
+                )
+                payment_sum = round(rng.uniform(50, body / 2), 2)
+                writers["payments.csv"].writerow(
+                    [
+                        payment_id,
+                        credit_id,
+                        _date(payment_date),
+                        rng.choice((1, 2)),
+                        f"{payment_sum:.2f}",
+                    ]
+                )
+                month_index = (payment_date.year - start.year) * 12 + (
+                    payment_date.month - start.month
+                )
+                if month_index < months:
+                    collected[month_index] += payment_sum
+
+        # Plans land within +-20% of what was actually issued and collected
+        plan_id = 0
+        for index in range(months):
+            for category_id, actual in (
+                (ISSUANCE_CATEGORY, issued[index]),
+                (COLLECTION_CATEGORY, collected[index]),
+            ):
+                plan_id += 1
+                writers["plans.csv"].writerow(
+                    [
+                        plan_id,
+                        _date(_month(start, index)),
+                        round(actual * rng.uniform(0.8, 1.2)),
+                        category_id,
+                    ]
+                )
+
+    counts = {
+        "users": users,
+        "credits": credits,
+        "payments": payment_id,
+        "plans": plan_id,
+    }
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Generated {counts} into {directory} in {elapsed:.2f}s "
+        f"({payment_id / elapsed:.0f} payments/sec)"
+    )
+    return counts
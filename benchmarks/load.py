@@ -0,0 +1,34 @@
+"""Load generated files into the database named by the .env settings.
+
+The schema is brought to head first. upload_test_files only fills empty
+tables, so --truncate empties every table (including the rollups) of
+that database before loading; point POSTGRES_DB at a scratch database.
+"""
+
+import logging
+import time
+
+from sqlalchemy import text
+
+import upload_test_files
+from auto_migrate import upgrade_database
+from backend.database import engine
+from backend.models import Base
+
+logger = logging.getLogger(__name__)
+
+
+def truncate():
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    logger.info(f"Truncated {tables}")
+
+
+def load(directory: str, reset: bool = False):
+    started = time.perf_counter()
+    upgrade_database()
+    if reset:
+        truncate()
+    upload_test_files.load(directory)
+    logger.info(f"Loaded {directory} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,252 @@
+"""Query-plan regression checks of the endpoint queries.
+
+Every check sends one request to the in-process app and captures the SQL
+it issues. Each captured statement is then run again under EXPLAIN
+(ANALYZE, BUFFERS) inside a transaction that is rolled back, and the
+plans are held against three limits:
+
+- no sequential scan reads more than --seq-scan-rows rows of payments
+  (summed over its partitions) or credits,
+- a request issues at most its check's statement count, which catches
+  per-row lookups (N+1); statements run with the "infrastructure"
+  execution option (replica lag probes, dictionary cache reloads) are
+  not captured,
+- no statement touches more than --buffer-budget shared buffers.
+
+Run it against a seeded benchmark database (see python -m benchmarks
+load). plans_insert re-imports the stored plans in upsert mode. Only
+the sync endpoints are checked; the async ones issue the same queries.
+The scenarios in UNCHECKED are skipped.
+"""
+
+import io
+import logging
+import random
+import threading
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+from benchmarks.scenarios import DataSet, Scenario, scenarios
+
+logger = logging.getLogger(__name__)
+
+SCANNED_TABLES = ("payments", "credits")
+
+# Statements a request of each scenario may issue
+MAX_STATEMENTS = {
+    "user_credit": 1,
+    "user_credit_page": 1,
+    "user_credit_overdue": 1,
+    "user_credit_batch": 1,
+    "plans_performance": 1,
+    "plans_performance_range": 1,
+    "portfolio_aging": 1,
+    "plans_insert": 1,
+    "plans_insert_existing": 1,
+}
+
+# Scenarios left out of the checks
+UNCHECKED = {
+    # Reads every credit and payment by design, with COPY on the DBAPI
+    # cursor, which bypasses the engine events
+    "collections_forecast",
+}
+
+
+@dataclass
+class StatementPlan:
+    statement: str
+    time_ms: float
+    buffers: int
+    seq_scans: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class CheckResult:
+    name: str
+    statements: list[StatementPlan]
+    failures: list[str]
+
+    def as_dict(self) -> dict:
+        return {
+            "statements": len(self.statements),
+            "failures": self.failures,
+            "plans": [
+                {
+                    "statement": plan.statement,
+                    "time_ms": round(plan.time_ms, 2),
+                    "buffers": plan.buffers,
+                    "seq_scans": plan.seq_scans,
+                }
+                for plan in self.statements
+            ],
+        }
+
+
+class StatementCapture:
+    def __init__(self, engines):
+        self.engines = engines
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def _capture(self, conn, cursor, statement, parameters, context, many):
+        if context.execution_options.get("infrastructure"):
+            return
+        if not many:
+            with self._lock:
+                self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._capture)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._capture)
+
+
+def _table(relation: str) -> str:
+    # Monthly partitions count towards payments
+    if relation.startswith("payments_"):
+        return "payments"
+    return relation
+
+
+def _seq_scans(node, scans):
+    if node["Node Type"] == "Seq Scan":
+        table = _table(node["Relation Name"])
+        rows = node.get("Actual Rows", 0) + node.get(
+            "Rows Removed by Filter", 0
+        )
+        scans[table] = scans.get(table, 0) + rows * node.get("Actual Loops", 1)
+    for child in node.get("Plans", []):
+        _seq_scans(child, scans)
+    return scans
+
+
+def explain(engine, statement, parameters) -> StatementPlan:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+        )
+        plan = cursor.fetchone()[0][0]
+    finally:
+        connection.rollback()
+        connection.close()
+    root = plan["Plan"]
+    return StatementPlan(
+        " ".join(statement.split()),
+        plan["Execution Time"],
+        root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        _seq_scans(root, {}),
+    )
+
+
+def check_scenarios(data: DataSet) -> list[Scenario]:
+    """The benchmark scenarios plus keyset pages, filters and the
+    existing-plan lookup of insert mode."""
+    extra = [
+        Scenario(
+            "user_credit_page",
+            lambda rng: (
+                "GET",
+                f"/user_credit/{data.user(rng)}",
+                {"params": {"limit": 2}},
+            ),
+            len,
+        ),
+        Scenario(
+            "user_credit_overdue",
+            lambda rng: (
+                "GET",
+                f"/user_credit/{data.user(rng)}",
+                {"params": {"overdue_only": True}},
+            ),
+            len,
+        ),
+        Scenario(
+            "plans_insert_existing",
+            lambda rng: (
+                "POST",
+                "/plans_insert",
+                {
+                    "files": {
+                        "file": ("plans.csv", io.BytesIO(data.plans_file))
+                    }
+                },
+            ),
+            len,
+        ),
+    ]
+    return scenarios(data) + extra
+
+
+def run_checks(
+    seq_scan_rows: int = 10_000,
+    buffer_budget: int = 10_000,
+    seed: int = 1,
+    only: list[str] | None = None,
+) -> list[CheckResult]:
+    from fastapi.testclient import TestClient
+
+    from backend.database import engine, read_engine
+    from backend.main import app
+
+    data = DataSet.read()
+    engines = [engine] + ([read_engine] if read_engine is not None else [])
+    results = []
+    with TestClient(app) as client:
+        for scenario in check_scenarios(data):
+            if scenario.name in UNCHECKED or (
+                only and scenario.name not in only
+            ):
+                continue
+            method, url, kwargs = scenario.request(
+                random.Random(f"{seed}:{scenario.name}")
+            )
+            with StatementCapture(engines) as capture:
+                response = client.request(method, url, **kwargs)
+            if response.status_code >= 500:
+                raise RuntimeError(
+                    f"{scenario.name}: {method} {url} answered "
+                    f"{response.status_code}"
+                )
+
+            failures = []
+            limit = MAX_STATEMENTS.get(scenario.name)
+            if limit is not None and len(capture.statements) > limit:
+                failures.append(
+                    f"{len(capture.statements)} statements, at most {limit} "
+                    "expected"
+                )
+            plans = [
+                explain(engine, statement, parameters)
+                for statement, parameters in capture.statements
+            ]
+            for number, plan in enumerate(plans, start=1):
+                for table in SCANNED_TABLES:
+                    rows = plan.seq_scans.get(table, 0)
+                    if rows > seq_scan_rows:
+                        failures.append(
+                            f"statement {number}: sequential scan of "
+                            f"{rows} {table} rows, at most {seq_scan_rows}"
+                        )
+                if plan.buffers > buffer_budget:
+                    failures.append(
+                        f"statement {number}: {plan.buffers} buffers, at "
+                        f"most {buffer_budget}"
+                    )
+            results.append(CheckResult(scenario.name, plans, failures))
+            for failure in failures:
+                logger.error(f"{scenario.name}: {failure}")
+            if not failures:
+                logger.info(
+                    f"{scenario.name}: {len(plans)} statements, "
+                    f"{max((plan.buffers for plan in plans), default=0)} "
+                    "buffers at most"
+                )
+    return results
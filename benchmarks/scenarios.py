@@ -0,0 +1,332 @@
+"""Latency and throughput scenarios against the API endpoints.
+
+Each scenario sends --requests requests from --concurrency threads after
+a few warm-up requests, and reports latency percentiles, requests/sec and
+rows/sec. Requests are drawn from a seeded random generator per thread,
+so two runs against the same data send the same requests. Without --url
+the app is served in-process through FastAPI's TestClient, which leaves
+out the network and the ASGI server but keeps everything else.
+
+plans_insert re-imports the stored plans with whole, non-negative sums
+(the only ones the import accepts) in upsert mode, so it writes but
+leaves the data as it was. /plans_performance answers repeated months
+from its cache; plans_performance_range always hits the database.
+collections_forecast reads every credit and payment before its month, so
+run it with fewer --requests on large data sets.
+"""
+
+import datetime
+import io
+import json
+import logging
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+
+from backend.database import SessionLocal
+from backend.models import Credit, Dictionary, Payment, Plan, User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    # Returns (method, url, keyword arguments of the client call)
+    request: Callable
+    # Rows a 200 response carries
+    rows: Callable
+    concurrency: int | None = None
+    # Other statuses that are not errors, e.g. 404 for users without credits
+    accepted: frozenset[int] = frozenset()
+
+
+@dataclass(frozen=True)
+class DataSet:
+    first_user: int
+    last_user: int
+    first_month: datetime.date
+    months: int
+    plans_file: bytes
+    plans: int
+    counts: dict
+
+    @classmethod
+    def read(cls) -> "DataSet":
+        with SessionLocal() as db:
+            first_user, last_user = db.execute(
+                select(func.min(User.id), func.max(User.id))
+            ).one()
+            first_month, last_month = db.execute(
+                select(func.min(Plan.period), func.max(Plan.period))
+            ).one()
+            plans = db.execute(
+                select(Plan.period, Plan.sum, Dictionary.name)
+                .join(Dictionary, Dictionary.id == Plan.category_id)
+                .where(Plan.sum >= 0, Plan.sum == func.trunc(Plan.sum))
+                .order_by(Plan.id)
+            ).all()
+            counts = {
+                name: db.scalar(select(func.count()).select_from(model))
+                for name, model in (
+                    ("users", User),
+                    ("credits", Credit),
+                    ("payments", Payment),
+                    ("plans", Plan),
+                )
+            }
+        if first_user is None or first_month is None:
+            raise SystemExit("Load users and plans before running scenarios")
+        return cls(
+            first_user,
+            last_user,
+            first_month.date(),
+            (last_month.year - first_month.year) * 12
+            + last_month.month
+            - first_month.month
+            + 1,
+            "".join(
+                f"{period:%d.%m.%Y}\t{sum:.0f}\t{name}\n"
+                for period, sum, name in plans
+            ).encode("utf-8"),
+            len(plans),
+            counts,
+        )
+
+    def month(self, index: int) -> datetime.date:
+        index += self.first_month.month - 1
+        return datetime.date(
+            self.first_month.year + index // 12, index % 12 + 1, 1
+        )
+
+    def user(self, rng: random.Random) -> int:
+        return rng.randint(self.first_user, self.last_user)
+
+
+def scenarios(data: DataSet, batch_size: int = 100) -> list[Scenario]:
+    def range_request(rng):
+        start = rng.randrange(data.months)
+        stop = min(start + 11, data.months - 1)
+        return (
+            "GET",
+            "/plans_performance_range",
+            {
+                "params": {
+                    "from": data.month(start).isoformat(),
+                    "to": data.month(stop).isoformat(),
+                }
+            },
+        )
+
+    return [
+        Scenario(
+            "user_credit",
+            lambda rng: ("GET", f"/user_credit/{data.user(rng)}", {}),
+            len,
+            accepted=frozenset({404}),
+        ),
+        Scenario(
+            "user_credit_batch",
+            lambda rng: (
+                "POST",
+                "/user_credit/batch",
+                {
+                    "json": {
+                        "user_ids": [data.user(rng) for _ in range(batch_size)]
+                    }
+                },
+            ),
+            lambda body: sum(len(item["credits"]) for item in body.values()),
+        ),
+        Scenario(
+            "plans_performance",
+            lambda rng: (
+                "GET",
+                "/plans_performance",
+                {
+                    "params": {
+                        "check_date": data.month(
+                            rng.randrange(data.months)
+                        ).isoformat()
+                    }
+                },
+            ),
+            len,
+        ),
+        Scenario("plans_performance_range", range_request, len),
+        Scenario(
+            "portfolio_aging",
+            lambda rng: ("GET", "/portfolio_aging", {}),
+            lambda body: len(body["buckets"]),
+        ),
+        Scenario(
+            "collections_forecast",
+            lambda rng: (
+                "GET",
+                "/collections_forecast",
+                {
+                    "params": {
+                        "as_of": data.month(
+                            rng.randrange(1, data.months)
+                        ).isoformat(),
+                        "months": 6,
+                    }
+                },
+            ),
+            len,
+        ),
+        Scenario(
+            "plans_insert",
+            lambda rng: (
+                "POST",
+                "/plans_insert",
+                {
+                    "params": {"mode": "upsert"},
+                    "files": {
+                        "file": ("plans.csv", io.BytesIO(data.plans_file))
+                    },
+                },
+            ),
+            lambda body: data.plans,
+            concurrency=1,
+        ),
+    ]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+def summarize(latencies, rows, errors, concurrency, elapsed) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "rows": rows,
+        "rows_per_sec": round(rows / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        },
+    }
+
+
+def run_scenario(
+    client, scenario: Scenario, requests: int, concurrency: int, seed: int
+) -> dict:
+    concurrency = scenario.concurrency or concurrency
+    latencies, rows, errors = [], 0, 0
+    lock = threading.Lock()
+
+    def worker(index: int, count: int):
+        nonlocal rows, errors
+        rng = random.Random(f"{seed}:{scenario.name}:{index}")
+        for _ in range(count):
+            method, url, kwargs = scenario.request(rng)
+            started = time.perf_counter()
+            response = client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code == 200:
+                    rows += scenario.rows(response.json())
+                elif response.status_code not in scenario.accepted:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(
+                worker,
+                index,
+                requests // concurrency + (index < requests % concurrency),
+            )
+            for index in range(concurrency)
+        ]
+        for future in futures:
+            future.result()
+    return summarize(
+        latencies, rows, errors, concurrency, time.perf_counter() - started
+    )
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    url: str | None = None,
+    requests: int = 200,
+    concurrency: int = 4,
+    warmup: int = 10,
+    seed: int = 1,
+    only: list[str] | None = None,
+) -> dict:
+    """Run the scenarios and return the machine-readable results."""
+    import httpx
+
+    data = DataSet.read()
+    selected = [
+        scenario
+        for scenario in scenarios(data)
+        if not only or scenario.name in only
+    ]
+    results = {
+        "meta": {
+            "started_at": datetime.datetime.now(
+                datetime.timezone.utc
+            ).isoformat(),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "target": url or "in-process",
+            "seed": seed,
+            "requests": requests,
+            "concurrency": concurrency,
+            "data": data.counts,
+        },
+        "scenarios": {},
+    }
+    if url:
+        client = httpx.Client(base_url=url, timeout=300)
+    else:
+        from fastapi.testclient import TestClient
+
+        from backend.main import app
+
+        client = TestClient(app)
+    with client:
+        for scenario in selected:
+            logger.info(f"Running {scenario.name}...")
+            if warmup:
+                run_scenario(client, scenario, warmup, 1, seed + 1)
+            results["scenarios"][scenario.name] = run_scenario(
+                client, scenario, requests, concurrency, seed
+            )
+            logger.info(
+                f"{scenario.name}: "
+                + json.dumps(results["scenarios"][scenario.name]["latency_ms"])
+            )
+    return results
@@ -1,22 +1,35 @@
+import argparse
 import csv
 import datetime
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import fastapi
+from sqlalchemy import (
+    DateTime,
+    Float,
+    Integer,
+    exists,
+    literal,
+    select,
+    text,
+    union_all,
+)
 
-from backend.database import SessionLocal, get_db
+from backend.database import SessionLocal, engine
 from backend.models import Credit, Dictionary, Payment, Plan, User
+from backend.partitions import split_default
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
 logger = logging.getLogger()
 
 
-files = [
-    "users.csv",
-    "dictionary.csv",
-    "credits.csv",
-    "plans.csv",
-    "payments.csv",
+# Files of one stage only reference tables loaded by earlier stages,
+# so they are copied in parallel.
+stages = [
+    ["users.csv", "dictionary.csv"],
+    ["credits.csv", "plans.csv"],
+    ["payments.csv"],
 ]
 
 classes = {
@@ -28,35 +41,159 @@ classes = {
 }
 
 
-def write_to_db(file, db):
-    with open(f"test_csv_set/{file}", "r", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            instance = classes[file]()
-            for key, value in row.items():
-                if isinstance(value, str) and value.count(".") == 2:
-                    value = convert_date(value)
-                elif value == "":
-                    value = None
-                setattr(instance, key, value)
-            db.add(instance)
-        db.commit()
+def convert_date(date_string):
+    return (
+        datetime.datetime.strptime(date_string, "%d.%m.%Y").date().isoformat()
+    )
 
 
-def convert_date(date_string):
-    return datetime.datetime.strptime(date_string, "%d.%m.%Y").date()
+def convert_text(value):
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def converter(column):
+    if isinstance(column.type, DateTime):
+        return convert_date
+    if isinstance(column.type, Integer):
+        return lambda value: str(int(value))
+    if isinstance(column.type, Float):
+        return lambda value: repr(float(value))
+    return convert_text
+
+
+class CopyStream:
+    """File-like object feeding converted CSV rows to COPY FROM STDIN in
+    the text format, without holding the whole file in memory."""
+
+    def __init__(self, reader, converters):
+        self.reader = reader
+        self.converters = converters
+        self.rows = 0
+        self.buffer = b""
+
+    def _line(self, row):
+        self.rows += 1
+        return (
+            "\t".join(
+                "\\N" if value == "" else convert(value)
+                for convert, value in zip(self.converters, row)
+            )
+            + "\n"
+        )
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            lines = [
+                self._line(row) for _, row in zip(range(1000), self.reader)
+            ]
+            if not lines:
+                break
+            self.buffer += "".join(lines).encode("utf-8")
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_file(directory, file):
+    table = classes[file].__table__
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        logger.info(f"Start upload {file}")
+        started = time.perf_counter()
+        with open(
+            f"{directory}/{file}", "r", encoding="utf-8", newline=""
+        ) as f:
+            reader = csv.reader(f, delimiter="\t")
+            header = next(reader)
+            stream = CopyStream(
+                reader, [converter(table.columns[name]) for name in header]
+            )
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(header)}) FROM STDIN", stream
+            )
+        connection.commit()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"End of upload {file}: {stream.rows} rows in {elapsed:.2f}s "
+            f"({stream.rows / elapsed:.0f} rows/sec)"
+        )
+    finally:
+        connection.close()
+
+
+def reset_sequences(db):
+    # Rows are loaded with explicit ids, so move each id sequence past them
+    for model in classes.values():
+        table = model.__tablename__
+        db.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            )
+        )
+    db.commit()
+
+
+def empty_files(connection) -> set[str]:
+    """Return the files whose tables hold no rows, probing all tables
+    with one query."""
+    probes = union_all(
+        *(
+            select(literal(file).label("file")).where(
+                ~exists().select_from(model.__table__)
+            )
+            for file, model in classes.items()
+        )
+    )
+    return set(connection.scalars(probes))
+
+
+def load(directory="test_csv_set"):
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        files = empty_files(connection)
+    if not files:
+        logger.info("Test data is already loaded")
+        return
+    for stage in stages:
+        stage = [file for file in stage if file in files]
+        if not stage:
+            continue
+        with ThreadPoolExecutor(max_workers=len(stage)) as executor:
+            for future in [
+                executor.submit(copy_file, directory, file) for file in stage
+            ]:
+                future.result()
+
+    with SessionLocal() as db:
+        reset_sequences(db)
+    with engine.begin() as connection:
+        split_default(connection)
+    logger.info(f"Upload finished in {time.perf_counter() - started:.2f}s")
 
 
 def main():
-    db = next(get_db())
-
-    for file in files:
-        if not db.query(classes[file]).first():
-            logger.info(f"Start upload {file}")
-            write_to_db(file, db)
-            logger.info(f"End of upload {file}")
-        else:
-            logger.info(f"{file} already exist in db")
+    parser = argparse.ArgumentParser(
+        description="Bulk load tab-separated files into empty tables."
+    )
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default="test_csv_set",
+        help="Directory with users.csv, dictionary.csv, credits.csv, "
+        "plans.csv and payments.csv",
+    )
+    load(parser.parse_args().directory)
 
 
 if __name__ == "__main__":